@@ -0,0 +1,38 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from core import audit, schemas
+from core.database import get_db
+from core.api.deps import get_current_user
+from core.models import AuditLogEntry, User # For type hinting current_user
+
+router = APIRouter(
+    prefix="/audit",
+    tags=["Audit Log"],
+)
+
+@router.get("/", response_model=List[schemas.AuditLogEntry])
+def read_audit_log(
+    actor_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Retrieve audit entries, newest first, optionally for a single actor.
+    Only available with the database sink; entries show up once flushed.
+    In a real app, you would restrict this to platform admins.
+    """
+    query = db.query(AuditLogEntry)
+    if actor_id is not None:
+        query = query.filter(AuditLogEntry.actor_id == actor_id)
+    return query.order_by(AuditLogEntry.id.desc()).offset(skip).limit(limit).all()
+
+@router.get("/metrics", response_model=schemas.AuditMetrics)
+def read_audit_metrics(current_user: User = Depends(get_current_user)):
+    """
+    Queue depth, entries written and dropped, and recent flush latency of
+    this worker's audit queue.
+    """
+    return audit.log.metrics()
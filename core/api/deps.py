@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -8,30 +9,56 @@ from core.database import get_db
 from core.security import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
+# Same scheme, but a missing token is not an error
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token", auto_error=False)
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-):
-    """
-    Dependency to get the current authenticated user.
-    - Decodes JWT token from the Authorization header.
-    - Fetches user from the database.
-    """
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def get_token_data(token: str = Depends(oauth2_scheme)) -> schemas.TokenData:
+    """
+    Dependency that only validates the JWT token, without a database
+    session. Used by long-lived endpoints (e.g. streams) that must not hold
+    a pooled connection for their whole lifetime.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+            raise credentials_exception()
+        return schemas.TokenData(email=email)
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
 
+def get_current_user(
+    db: Session = Depends(get_db), token_data: schemas.TokenData = Depends(get_token_data)
+):
+    """
+    Dependency to get the current authenticated user.
+    - Decodes JWT token from the Authorization header.
+    - Fetches user from the database.
+    """
     user = crud.get_user_by_email(db, email=token_data.email)
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
+
+def get_optional_user(
+    db: Session = Depends(get_db), token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """
+    Dependency for endpoints that also accept anonymous calls: the current
+    user when a valid token is sent, else None. An expired or malformed token
+    counts as anonymous, so it cannot lock a client out of a public endpoint.
+    Used to attribute writes in the audit log.
+    """
+    if token is None:
+        return None
+    try:
+        return get_current_user(db, get_token_data(token))
+    except HTTPException:
+        return None
@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from core import events, schemas
+from core.api.deps import get_token_data
+from core.config import settings
+
+router = APIRouter(
+    prefix="/events",
+    tags=["Change Feed"],
+)
+
+def format_event(event: events.ChangeEvent) -> str:
+    data = json.dumps({"school_id": event.school_id, **event.data}, separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+async def event_stream(request: Request, subscription: events.Subscription, backlog, complete: bool,
+                       heartbeat_interval: float = None):
+    """
+    Yields the backlog, then live events, with keep-alive comments while idle.
+    Ends when the client disconnects or falls too far behind.
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = settings.event_heartbeat_interval
+    try:
+        yield "retry: 3000\n\n"
+        if not complete:
+            # Events since the client's Last-Event-ID are gone: it must refetch
+            yield f"id: {subscription.last_id}\nevent: reset\ndata: {{}}\n\n"
+        for event in backlog:
+            yield format_event(event)
+        while True:
+            try:
+                event = await subscription.get(timeout=heartbeat_interval)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # Buffer overflowed: the client reconnects with its Last-Event-ID
+                return
+            yield format_event(event)
+    finally:
+        events.log.unsubscribe(subscription)
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    school_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None),
+    token_data: schemas.TokenData = Depends(get_token_data),
+):
+    """
+    Server-Sent Events feed of school, branch and role assignment changes.
+    Optionally limited to one school; reconnecting clients resume from the
+    Last-Event-ID header.
+    """
+    # Catch up with the shared log first, so ids handed out by any worker resume here
+    await run_in_threadpool(events.log.sync)
+    subscription, backlog, complete = events.log.subscribe(school_id=school_id, last_event_id=last_event_id)
+    return StreamingResponse(
+        event_stream(
+            request, subscription, backlog, complete,
+            heartbeat_interval=request.app.state.settings.event_heartbeat_interval,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from core import crud, jobs, schemas
+from core.database import get_db
+from core.api.deps import get_current_user
+from core.models import Job, User # For type hinting current_user
+from core.security import get_password_hash
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Background Jobs"],
+)
+
+@router.post("/provision-school", response_model=schemas.Job, status_code=status.HTTP_202_ACCEPTED)
+def submit_school_provisioning(
+    provision: schemas.SchoolProvision,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Queue the creation of a school with its branches, roles and admin users.
+    Poll GET /jobs/{job_id} for progress and the created ids.
+    """
+    if crud.get_school_by_name(db, name=provision.name):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="School already exists",
+        )
+    params = schemas.SchoolProvisionParams(
+        **provision.model_dump(exclude={"admins"}),
+        admins=[
+            schemas.ProvisionedAdmin(
+                **admin.model_dump(exclude={"password"}), hashed_password=get_password_hash(admin.password)
+            )
+            for admin in provision.admins
+        ],
+    )
+    return jobs.runner.submit(
+        db, "provision_school", params.model_dump(), submitted_by=current_user.id
+    )
+
+@router.get("/{job_id}", response_model=schemas.Job)
+def read_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Retrieve the status, progress and result of a job.
+    """
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
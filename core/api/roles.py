@@ -1,7 +1,7 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from core import crud, schemas
+from core import crud, reference, schemas
 from core.database import get_db
 from core.api.deps import get_current_user
 from core.models import User # For type hinting current_user
@@ -22,7 +22,33 @@ def create_new_role(
     In a real app, you would add logic here to ensure the current_user
     has permission to create roles (e.g., is a platform or school admin).
     """
-    return crud.create_role(db=db, role=role)
+    return crud.create_role(db=db, role=role, actor_id=current_user.id)
+
+@router.get("/", response_model=List[schemas.Role])
+def read_all_roles(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Retrieve all roles with their permissions.
+    """
+    return reference.get_snapshot(db).list_roles(skip=skip, limit=limit)
+
+@router.get("/{role_id}", response_model=schemas.Role)
+def read_single_role(
+    role_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Retrieve a single role by its ID.
+    """
+    role = reference.get_snapshot(db).roles.get(role_id)
+    if role is None:
+        raise HTTPException(status_code=404, detail="Role not found")
+    return role
 
 @router.post("/assign", response_model=schemas.UserRoleAssignment, status_code=status.HTTP_201_CREATED)
 def assign_role_to_user_endpoint(
@@ -36,4 +62,4 @@ def assign_role_to_user_endpoint(
     has permission to assign roles for the given school/branch.
     """
     # Here you would add validation to check if user, role, and branch exist
-    return crud.assign_role_to_user(db=db, assignment=assignment)
+    return crud.assign_role_to_user(db=db, assignment=assignment, actor_id=current_user.id)
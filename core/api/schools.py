@@ -1,8 +1,10 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from core import crud, schemas
+from core import crud, reference, schemas, stats
 from core.database import get_db
+from core.api.deps import get_optional_user
+from core.models import User # For type hinting current_user
 
 router = APIRouter(
     prefix="/schools",
@@ -10,33 +12,54 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.School, status_code=status.HTTP_201_CREATED)
-def create_new_school(school: schemas.SchoolCreate, db: Session = Depends(get_db)):
+def create_new_school(
+    school: schemas.SchoolCreate,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user),
+):
     """
     Create a new school.
     """
-    return crud.create_school(db=db, school=school)
+    return crud.create_school(db=db, school=school, actor_id=current_user.id if current_user else None)
 
 @router.get("/", response_model=List[schemas.School])
 def read_all_schools(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Retrieve all schools.
     """
-    schools = crud.get_schools(db, skip=skip, limit=limit)
-    return schools
+    return reference.get_snapshot(db).list_schools(skip=skip, limit=limit)
 
 @router.get("/{school_id}", response_model=schemas.School)
 def read_single_school(school_id: int, db: Session = Depends(get_db)):
     """
     Retrieve a single school by its ID.
     """
-    db_school = crud.get_school(db, school_id=school_id)
-    if db_school is None:
+    school = reference.get_snapshot(db).schools.get(school_id)
+    if school is None:
         raise HTTPException(status_code=404, detail="School not found")
-    return db_school
+    return school
+
+@router.get("/{school_id}/stats", response_model=schemas.SchoolStats)
+def read_school_stats(school_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieve branch, role and user counts for a school.
+    Read from incrementally maintained summary tables.
+    """
+    school_stats = stats.get_school_stats(db, school_id=school_id)
+    if school_stats is None:
+        if school_id not in reference.get_snapshot(db).schools:
+            raise HTTPException(status_code=404, detail="School not found")
+        # Created before the summary tables existed: build its row now
+        stats.reconcile(db, school_id=school_id)
+        school_stats = stats.get_school_stats(db, school_id=school_id)
+    return school_stats
 
 @router.post("/{school_id}/branches/", response_model=schemas.Branch, status_code=status.HTTP_201_CREATED)
 def create_new_branch_for_school(
-    school_id: int, branch: schemas.BranchCreate, db: Session = Depends(get_db)
+    school_id: int,
+    branch: schemas.BranchCreate,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user),
 ):
     """
     Create a new branch for a specific school.
@@ -44,4 +67,6 @@ def create_new_branch_for_school(
     db_school = crud.get_school(db, school_id=school_id)
     if db_school is None:
         raise HTTPException(status_code=404, detail="School not found")
-    return crud.create_branch_for_school(db=db, branch=branch, school_id=school_id)
+    return crud.create_branch_for_school(
+        db=db, branch=branch, school_id=school_id, actor_id=current_user.id if current_user else None
+    )
@@ -1,20 +1,28 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from core import crud
-from core import crud, schemas
-from core.schemas import User, UserCreate, UserUpdate
+from core import crud, family
+from core.schemas import FamilyGraph, User, UserActivation, UserCreate, UserUpdate
 from core.database import get_db
-from core.api.deps import get_current_user
+from core.api.deps import get_current_user, get_optional_user
 
 router = APIRouter(
     prefix="/users",
     tags=["Users"],
 )
 
+def require_parent(parent_id: int, current_user: User):
+    if parent_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to change another user's children",
+        )
+
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 def create_new_user(
     user: UserCreate,
     db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user),
 ):
     """
     Create a new user.
@@ -25,7 +33,7 @@ def create_new_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
-    return crud.create_user(db=db, user=user)
+    return crud.create_user(db=db, user=user, actor_id=current_user.id if current_user else None)
 
 @router.get("/me", response_model=User)
 def read_users_me(current_user: User = Depends(get_current_user)):
@@ -43,5 +51,94 @@ def update_user_me(
     """
     Update current user.
     """
-    user = crud.update_user(db, db_user=current_user, user_in=user_in)
+    user = crud.update_user(db, db_user=current_user, user_in=user_in, actor_id=current_user.id)
     return user
+
+@router.put("/{user_id}/activation", response_model=User)
+def update_user_activation(
+    user_id: int,
+    activation: UserActivation,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Activate or deactivate a user.
+    In a real app, you would restrict this to school or platform admins.
+    """
+    db_user = crud.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return crud.set_user_active(db, db_user=db_user, is_active=activation.is_active, actor_id=current_user.id)
+
+@router.get("/me/family", response_model=FamilyGraph)
+def read_my_family(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the current user's family: parents, children, siblings and co-parents,
+    with their profiles and role assignments.
+    """
+    return family.get_family_graph(db, user_id=current_user.id)
+
+@router.get("/{user_id}/family", response_model=FamilyGraph)
+def read_user_family(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the family of a member of the current user's own family.
+    """
+    if user_id != current_user.id:
+        own = family.get_family_graph(db, user_id=current_user.id)
+        if own is None or user_id not in {member.id for member in own.members}:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not a member of your family",
+            )
+    graph = family.get_family_graph(db, user_id=user_id)
+    if graph is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return graph
+
+@router.post("/{parent_id}/children/{child_id}", status_code=status.HTTP_204_NO_CONTENT)
+def link_child(
+    parent_id: int,
+    child_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Link a child to the current user, as their parent.
+    """
+    require_parent(parent_id, current_user)
+    if parent_id == child_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A user cannot be their own parent",
+        )
+    parent = crud.get_user(db, user_id=parent_id)
+    child = crud.get_user(db, user_id=child_id)
+    if parent is None or child is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if child in parent.children:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Child already linked",
+        )
+    crud.link_parent_child(db, parent_id=parent_id, child_id=child_id, actor_id=current_user.id)
+
+@router.delete("/{parent_id}/children/{child_id}", status_code=status.HTTP_204_NO_CONTENT)
+def unlink_child(
+    parent_id: int,
+    child_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Remove the link between the current user and one of their children.
+    """
+    require_parent(parent_id, current_user)
+    if not crud.unlink_parent_child(db, parent_id=parent_id, child_id=child_id, actor_id=current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found")
@@ -0,0 +1,249 @@
+"""
+Asynchronous, batched audit trail of write operations.
+
+The CRUD write functions `record` an entry (who did what to which entity)
+after their own commit. Recording only puts the entry on a bounded
+in-memory queue; a background thread takes it off in batches and appends
+them to the configured sink, so requests never wait for an audit insert
+and never hold their transaction open for one.
+
+Sinks:
+- `DatabaseSink`: one multi-row INSERT per batch into the append-only
+  `audit_log` table.
+- `FileSink`: one JSON object per line (NDJSON), rotated by size like
+  `logging.handlers.RotatingFileHandler`.
+
+Backpressure: when the queue is full, `record` waits up to `put_timeout`
+for the flusher to make room, slowing writers down instead of growing
+memory. Entries that still do not fit are dropped and counted. A batch the
+sink rejects is kept and retried first on the next flush, so a sink outage
+fills the queue rather than losing what was already accepted. `stop` drains
+everything that is queued before returning.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+from core.models import AuditLogEntry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AuditEntry:
+    action: str
+    entity_type: str
+    entity_id: str
+    actor_id: Optional[int]
+    data: dict
+    occurred_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def to_json(self) -> str:
+        entry = asdict(self)
+        entry["occurred_at"] = self.occurred_at.isoformat()
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+# --- Sinks ---
+
+class DatabaseSink:
+    url = "database://"
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def write(self, entries: List[AuditEntry]):
+        with self.session_factory() as db:
+            db.execute(insert(AuditLogEntry), [asdict(entry) for entry in entries])
+            db.commit()
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.url = f"file://{path}"
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def write(self, entries: List[AuditEntry]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+        self._file.write("".join(entry.to_json() + "\n" for entry in entries))
+        self._file.flush()
+
+    def _rotate(self):
+        # audit.ndjson -> audit.ndjson.1 -> ... -> audit.ndjson.<backups>
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def create_sink(url: str, max_bytes: int = None, backups: int = None):
+    """
+    Builds a sink from a URL such as "database://" or
+    "file:///var/log/edu/audit.ndjson".
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "database":
+        return DatabaseSink(SessionLocal)
+    if parsed.scheme == "file":
+        return FileSink(
+            parsed.path,
+            max_bytes=settings.audit_file_max_bytes if max_bytes is None else max_bytes,
+            backups=settings.audit_file_backups if backups is None else backups,
+        )
+    raise ValueError(f"Unsupported audit sink URL: {url}")
+
+
+# --- Queue and flusher ---
+
+class AuditLog:
+    def __init__(self, sink, capacity: int = 10000, batch_size: int = 500, flush_interval: float = 1.0,
+                 put_timeout: float = 0.5):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.queue: queue.Queue = queue.Queue(maxsize=capacity)
+        # Serialises flushes (the flusher thread, `stop` and explicit calls)
+        self._flush_lock = threading.Lock()
+        self._pending: List[AuditEntry] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self._dropped_lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=100)
+
+    def record(self, action: str, entity_type: str, entity_id, actor_id: Optional[int] = None,
+               data: Optional[dict] = None):
+        entry = AuditEntry(
+            action=action, entity_type=entity_type, entity_id=str(entity_id), actor_id=actor_id, data=data or {}
+        )
+        try:
+            self.queue.put(entry, timeout=self.put_timeout)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            logger.warning("Audit queue full, dropped %s %s:%s", action, entity_type, entity_id)
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """
+        Writes everything queued so far, in batches of `batch_size`.
+        Returns the number of entries written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._pending
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                start = time.perf_counter()
+                try:
+                    self.sink.write(batch)
+                except Exception:
+                    self.failed_flushes += 1
+                    # Kept (and retried first) so accepted entries are not lost
+                    self._pending = batch
+                    logger.exception("Writing %d audit entries failed", len(batch))
+                    return written
+                self._latencies.append(time.perf_counter() - start)
+                self._pending = []
+                self.written += len(batch)
+                written += len(batch)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        """
+        Stops the flusher and drains the queue into the sink.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        self.sink.close()
+
+    def metrics(self) -> dict:
+        latencies = list(self._latencies)
+        return {
+            "queue_depth": self.queue.qsize() + len(self._pending),
+            "queue_capacity": self.queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_seconds": latencies[-1] if latencies else None,
+            "avg_flush_seconds": sum(latencies) / len(latencies) if latencies else None,
+            "max_flush_seconds": max(latencies) if latencies else None,
+        }
+
+    def clear(self):
+        with self._flush_lock:
+            self._pending = []
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+
+log = AuditLog(
+    create_sink(settings.audit_sink_url),
+    capacity=settings.audit_queue_capacity,
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval,
+    put_timeout=settings.audit_put_timeout,
+)
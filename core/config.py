@@ -0,0 +1,96 @@
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Runtime configuration, read from environment variables.
+    """
+    database_url: str = "sqlite:///./app.db"
+    # Connections opened at start-up so the first requests find a warm pool
+    warm_connections: int = 5
+    # bcrypt work factor for new password hashes. Tests use the minimum (4)
+    # to avoid paying full hashing cost for every user they create.
+    bcrypt_rounds: int = 12
+    # Where cache invalidation events are exchanged between workers:
+    # "memory://" (single process), "sqlite:///./bus.db" (single host)
+    # or "redis://host:port/channel" (anything speaking the Redis protocol).
+    invalidation_bus_url: str = "memory://"
+    invalidation_poll_interval: float = 0.05
+    # Seconds a reference snapshot is served before it is rebuilt from the
+    # database. Bounds how stale reads can get when another worker's writes
+    # are not delivered (e.g. several workers on the "memory://" bus).
+    reference_max_age: float = 5.0
+    # Seconds between full recomputations of the per-school statistics
+    # tables; 0 disables the background reconciler.
+    stats_reconcile_interval: float = 3600.0
+    # Background jobs running at the same time in one worker, and the base
+    # delay (doubled per attempt) before a failed job is retried.
+    job_workers: int = 2
+    job_retry_delay: float = 5.0
+    # A running job whose worker has not renewed its lease for this many
+    # seconds is assumed dead (crash, kill -9) and queued again.
+    job_lease: float = 300.0
+    # Idempotency-Key store (per worker process): how long responses are
+    # kept, how many, and how long a duplicate waits for the in-flight original.
+    idempotency_ttl: float = 86400.0
+    idempotency_max_entries: int = 10000
+    idempotency_wait_timeout: float = 30.0
+    # Change feed: events retained for resuming, per-client buffer before a
+    # slow client is disconnected, and seconds between keep-alive comments.
+    event_log_capacity: int = 10000
+    event_subscriber_buffer: int = 256
+    event_heartbeat_interval: float = 15.0
+    # Audit trail of writes: "database://" (the audit_log table) or
+    # "file:///path/to/audit.ndjson" (rotated at audit_file_max_bytes,
+    # keeping audit_file_backups old files).
+    audit_sink_url: str = "database://"
+    audit_file_max_bytes: int = 10 * 1024 * 1024
+    audit_file_backups: int = 5
+    # Audit queue: entries buffered in memory, entries written per batch,
+    # seconds between flushes, and how long a write waits for room in a full
+    # queue before the entry is dropped (and counted).
+    audit_queue_capacity: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 1.0
+    audit_put_timeout: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=os.getenv("DATABASE_URL", cls.database_url),
+            warm_connections=int(os.getenv("WARM_CONNECTIONS", cls.warm_connections)),
+            bcrypt_rounds=int(os.getenv("BCRYPT_ROUNDS", cls.bcrypt_rounds)),
+            invalidation_bus_url=os.getenv("INVALIDATION_BUS_URL", cls.invalidation_bus_url),
+            invalidation_poll_interval=float(
+                os.getenv("INVALIDATION_POLL_INTERVAL", cls.invalidation_poll_interval)
+            ),
+            reference_max_age=float(os.getenv("REFERENCE_MAX_AGE", cls.reference_max_age)),
+            stats_reconcile_interval=float(
+                os.getenv("STATS_RECONCILE_INTERVAL", cls.stats_reconcile_interval)
+            ),
+            job_workers=int(os.getenv("JOB_WORKERS", cls.job_workers)),
+            job_retry_delay=float(os.getenv("JOB_RETRY_DELAY", cls.job_retry_delay)),
+            job_lease=float(os.getenv("JOB_LEASE", cls.job_lease)),
+            idempotency_ttl=float(os.getenv("IDEMPOTENCY_TTL", cls.idempotency_ttl)),
+            idempotency_max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", cls.idempotency_max_entries)),
+            idempotency_wait_timeout=float(
+                os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", cls.idempotency_wait_timeout)
+            ),
+            event_log_capacity=int(os.getenv("EVENT_LOG_CAPACITY", cls.event_log_capacity)),
+            event_subscriber_buffer=int(os.getenv("EVENT_SUBSCRIBER_BUFFER", cls.event_subscriber_buffer)),
+            event_heartbeat_interval=float(
+                os.getenv("EVENT_HEARTBEAT_INTERVAL", cls.event_heartbeat_interval)
+            ),
+            audit_sink_url=os.getenv("AUDIT_SINK_URL", cls.audit_sink_url),
+            audit_file_max_bytes=int(os.getenv("AUDIT_FILE_MAX_BYTES", cls.audit_file_max_bytes)),
+            audit_file_backups=int(os.getenv("AUDIT_FILE_BACKUPS", cls.audit_file_backups)),
+            audit_queue_capacity=int(os.getenv("AUDIT_QUEUE_CAPACITY", cls.audit_queue_capacity)),
+            audit_batch_size=int(os.getenv("AUDIT_BATCH_SIZE", cls.audit_batch_size)),
+            audit_flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", cls.audit_flush_interval)),
+            audit_put_timeout=float(os.getenv("AUDIT_PUT_TIMEOUT", cls.audit_put_timeout)),
+        )
+
+
+settings = Settings.from_env()
@@ -1,7 +1,10 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, insert, literal, or_, select
+from sqlalchemy.orm import Session, selectinload
 from typing import Optional
-from core import schemas
-from core.models import User, School, Branch, Role, UserRoleAssignment
+from core import audit, events, invalidation, reference, schemas, stats
+from core.models import (
+    User, School, Branch, Role, UserRoleAssignment, parent_child_association
+)
 from core.security import get_password_hash
 
 # --- User CRUD ---
@@ -12,12 +15,18 @@ def get_user_by_email(db: Session, email: str):
     """
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, actor_id: Optional[int] = None):
     """
     Creates a new user in the database.
     - Hashes the password before storing.
     """
-    hashed_password = get_password_hash(user.password)
+    return create_user_with_hash(db, user, get_password_hash(user.password), actor_id=actor_id)
+
+def create_user_with_hash(db: Session, user: schemas.UserBase, hashed_password: str, actor_id: Optional[int] = None):
+    """
+    Creates a new user whose password was already hashed (e.g. by the API,
+    before handing the user to a background job).
+    """
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -27,30 +36,144 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    audit.log.record(
+        "user.created", "user", db_user.id, actor_id=actor_id,
+        data=user.model_dump(include=set(schemas.UserBase.model_fields)),
+    )
     return db_user
 
-def update_user(db: Session, db_user: User, user_in: schemas.UserUpdate):
+def update_user(db: Session, db_user: User, user_in: schemas.UserUpdate, actor_id: Optional[int] = None):
     update_data = user_in.model_dump(exclude_unset=True)
     for field in update_data:
         setattr(db_user, field, update_data[field])
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    invalidation.publish("user", db_user.id)
+    audit.log.record("user.updated", "user", db_user.id, actor_id=actor_id, data=update_data)
     return db_user
 
+def get_user(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+def set_user_active(db: Session, db_user: User, is_active: bool, actor_id: Optional[int] = None):
+    """
+    Activates or deactivates a user, keeping the per-school active/inactive
+    counters in step.
+    """
+    if bool(db_user.is_active is not False) != is_active:
+        stats.activation_changed(db, db_user, is_active)
+    db_user.is_active = is_active
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    invalidation.publish("user", db_user.id)
+    audit.log.record(
+        "user.activated" if is_active else "user.deactivated", "user", db_user.id, actor_id=actor_id
+    )
+    return db_user
+
+# --- Family (Parent/Child) CRUD ---
+
+def link_parent_child(db: Session, parent_id: int, child_id: int, actor_id: Optional[int] = None):
+    db.execute(insert(parent_child_association).values(parent_user_id=parent_id, child_user_id=child_id))
+    db.commit()
+    invalidation.publish("family", parent_id)
+    invalidation.publish("family", child_id)
+    audit.log.record(
+        "family.linked", "user", child_id, actor_id=actor_id, data={"parent_id": parent_id, "child_id": child_id}
+    )
+
+def unlink_parent_child(db: Session, parent_id: int, child_id: int, actor_id: Optional[int] = None) -> bool:
+    result = db.execute(
+        delete(parent_child_association).where(
+            parent_child_association.c.parent_user_id == parent_id,
+            parent_child_association.c.child_user_id == child_id,
+        )
+    )
+    db.commit()
+    if not result.rowcount:
+        return False
+    invalidation.publish("family", parent_id)
+    invalidation.publish("family", child_id)
+    audit.log.record(
+        "family.unlinked", "user", child_id, actor_id=actor_id, data={"parent_id": parent_id, "child_id": child_id}
+    )
+    return True
+
+def get_family_links(db: Session, user_id: int):
+    """
+    Resolves every parent/child link reachable from `user_id` in a single
+    recursive CTE, walking the association table in both directions.
+    Returns (member_ids, [(parent_id, child_id), ...]).
+    """
+    link = parent_child_association.c
+    family = select(literal(user_id).label("user_id")).cte("family", recursive=True)
+    # Each step follows a link either down (to a child) or up (to a parent).
+    # UNION (not UNION ALL) de-duplicates, so cycles terminate.
+    family = family.union(
+        select(
+            case(
+                (link.parent_user_id == family.c.user_id, link.child_user_id),
+                else_=link.parent_user_id,
+            )
+        ).join(
+            family,
+            or_(link.parent_user_id == family.c.user_id, link.child_user_id == family.c.user_id),
+        )
+    )
+    links = db.execute(
+        select(link.parent_user_id, link.child_user_id).where(
+            link.parent_user_id.in_(select(family.c.user_id))
+        )
+    ).all()
+    member_ids = {user_id}
+    for parent_id, child_id in links:
+        member_ids.update((parent_id, child_id))
+    return member_ids, [tuple(row) for row in links]
+
+def get_users_with_family_details(db: Session, user_ids):
+    """
+    Loads users together with their profiles and role assignments (with the
+    role and branch of each), using one query per relationship.
+    """
+    return (
+        db.query(User)
+        .filter(User.id.in_(user_ids))
+        .options(
+            selectinload(User.student_profile),
+            selectinload(User.teacher_profile),
+            selectinload(User.parent_profile),
+            selectinload(User.role_assignments).selectinload(UserRoleAssignment.role),
+            selectinload(User.role_assignments).selectinload(UserRoleAssignment.branch),
+        )
+        .order_by(User.id)
+        .all()
+    )
+
 # --- School CRUD ---
 
 def get_school(db: Session, school_id: int):
     return db.query(School).filter(School.id == school_id).first()
 
+def get_school_by_name(db: Session, name: str):
+    return db.query(School).filter(School.name == name).first()
+
 def get_schools(db: Session, skip: int = 0, limit: int = 100):
     return db.query(School).offset(skip).limit(limit).all()
 
-def create_school(db: Session, school: schemas.SchoolCreate):
+def create_school(db: Session, school: schemas.SchoolCreate, actor_id: Optional[int] = None):
     db_school = School(name=school.name)
     db.add(db_school)
+    db.flush()
+    stats.school_created(db, db_school)
+    events.log.record(db, "school.created", db_school.id, {"id": db_school.id, "name": db_school.name})
     db.commit()
     db.refresh(db_school)
+    reference.add_school(db_school)
+    invalidation.publish("reference", f"school:{db_school.id}")
+    events.notify()
+    audit.log.record("school.created", "school", db_school.id, actor_id=actor_id, data={"name": db_school.name})
     return db_school
 
 
@@ -59,25 +182,53 @@ def create_school(db: Session, school: schemas.SchoolCreate):
 def get_branches_by_school(db: Session, school_id: int, skip: int = 0, limit: int = 100):
     return db.query(Branch).filter(Branch.school_id == school_id).offset(skip).limit(limit).all()
 
-def create_branch_for_school(db: Session, branch: schemas.BranchCreate, school_id: int):
+def create_branch_for_school(db: Session, branch: schemas.BranchCreate, school_id: int,
+                             actor_id: Optional[int] = None):
     db_branch = Branch(**branch.model_dump(), school_id=school_id)
     db.add(db_branch)
+    db.flush()
+    stats.branch_created(db, db_branch)
+    events.log.record(
+        db, "branch.created", school_id, {"id": db_branch.id, "name": db_branch.name, "school_id": school_id}
+    )
     db.commit()
     db.refresh(db_branch)
+    reference.add_branch(db_branch)
+    invalidation.publish("reference", f"school:{school_id}")
+    events.notify()
+    audit.log.record(
+        "branch.created", "branch", db_branch.id, actor_id=actor_id,
+        data={"name": db_branch.name, "school_id": school_id},
+    )
     return db_branch
 
 # --- Role & Assignment CRUD ---
 
-def create_role(db: Session, role: schemas.RoleCreate, school_id: Optional[int] = None):
+def create_role(db: Session, role: schemas.RoleCreate, school_id: Optional[int] = None,
+                actor_id: Optional[int] = None):
     db_role = Role(name=role.name, school_id=school_id)
     db.add(db_role)
     db.commit()
     db.refresh(db_role)
+    reference.add_role(db_role)
+    invalidation.publish("reference", f"role:{db_role.id}")
+    audit.log.record(
+        "role.created", "role", db_role.id, actor_id=actor_id, data={"name": db_role.name, "school_id": school_id}
+    )
     return db_role
 
-def assign_role_to_user(db: Session, assignment: schemas.UserRoleAssignmentCreate):
+def assign_role_to_user(db: Session, assignment: schemas.UserRoleAssignmentCreate, actor_id: Optional[int] = None):
     db_assignment = UserRoleAssignment(**assignment.model_dump())
     db.add(db_assignment)
+    db.flush()
+    stats.role_assigned(db, db_assignment)
+    assigned = schemas.UserRoleAssignment.model_validate(db_assignment).model_dump()
+    events.log.record(
+        db, "role.assigned", db_assignment.branch.school_id if db_assignment.branch else None, assigned
+    )
     db.commit()
     db.refresh(db_assignment)
+    invalidation.publish("user", db_assignment.user_id)
+    events.notify()
+    audit.log.record("role.assigned", "role_assignment", db_assignment.id, actor_id=actor_id, data=assigned)
     return db_assignment
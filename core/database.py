@@ -1,15 +1,46 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from core.config import settings
 
-# We will use the same SQLite database file created by Alembic.
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+# By default, the same SQLite database file created by Alembic.
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(
-    # The `connect_args` are needed only for SQLite.
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def _create_engine(url: str):
+    return create_engine(
+        # The `connect_args` are needed only for SQLite.
+        url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {}
+    )
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def configure(url: str):
+    """
+    Points the engine (and every session made by `SessionLocal`) at `url`.
+    """
+    global engine, SQLALCHEMY_DATABASE_URL
+    if url != SQLALCHEMY_DATABASE_URL:
+        engine.dispose()
+        engine = _create_engine(url)
+        SQLALCHEMY_DATABASE_URL = url
+        SessionLocal.configure(bind=engine)
+    return engine
+
+def warm_pool(connections: int):
+    """
+    Opens `connections` connections at once and returns them to the pool,
+    so the first requests do not pay for connection setup.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.exec_driver_sql("SELECT 1")
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+
 # Dependency to get a DB session for each request.
 def get_db():
     db = SessionLocal()
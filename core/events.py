@@ -0,0 +1,217 @@
+"""
+Change log for schools, branches and role assignments.
+
+The CRUD write functions `record` an event in the `change_events` table in
+the same transaction as the change itself, and `notify` the workers once it
+is committed. Notifications travel over the cache invalidation bus
+(`core.invalidation`), so every worker, including the writer, `sync`s the
+new rows into its in-memory log. Event ids are the table's ids and so are
+the same on every worker: a client can resume from its Last-Event-ID on any
+of them. (SQLite serialises writers, so ids also follow commit order.)
+Behind several workers, configure a shared bus (INVALIDATION_BUS_URL):
+with "memory://" only the writing worker is notified.
+
+The SSE endpoint (`core.api.events`) replays the retained tail of the
+in-memory log from a client's Last-Event-ID and then streams new events as
+they are synced. Each subscriber owns a small bounded queue on its event
+loop. Appending never blocks: if a client falls behind and its queue fills
+up, the subscription is closed and the client resumes from its last event
+id on reconnect, so a slow client can never hold on to unbounded memory.
+"""
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core import invalidation
+from core.config import settings
+from core.database import SessionLocal
+from core.models import ChangeLogEntry
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    id: int
+    type: str
+    school_id: Optional[int]
+    data: dict
+
+
+class Subscription:
+    def __init__(self, log: "EventLog", school_id: Optional[int], loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.log = log
+        self.school_id = school_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+        # Events up to this id were already handed out as backlog
+        self.last_id = 0
+
+    def matches(self, event: ChangeEvent) -> bool:
+        return self.school_id is None or event.school_id == self.school_id
+
+    def offer(self, event: ChangeEvent):
+        """
+        Called from any thread by `EventLog.append`.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The client's event loop is gone
+            self.log.unsubscribe(self)
+
+    def _put(self, event: ChangeEvent):
+        if self.overflowed or event.id <= self.last_id:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.log.unsubscribe(self)
+            # Drop what is buffered (the client gets it again when it resumes
+            # from its last delivered id) and tell the reader to disconnect
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[ChangeEvent]:
+        """
+        Next event, or None when the subscription overflowed.
+        Raises asyncio.TimeoutError if nothing arrives within `timeout`.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventLog:
+    def __init__(self, capacity: int = 10000, subscriber_buffer: int = 256,
+                 session_factory: Optional[Callable[[], Session]] = None):
+        self.capacity = capacity
+        self.subscriber_buffer = subscriber_buffer
+        self.session_factory = session_factory
+        self._events: deque = deque(maxlen=capacity)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+        self._subscribers: set = set()
+
+    def record(self, db: Session, type: str, school_id: Optional[int], data: dict):
+        """
+        Adds an event to the shared table within the caller's transaction.
+        Call `notify` once it is committed.
+        """
+        entry = ChangeLogEntry(type=type, school_id=school_id, data=data)
+        db.add(entry)
+        db.flush()
+        # Keep the table small; workers only ever sync the newest rows
+        if entry.id % 1000 == 0:
+            db.query(ChangeLogEntry).filter(ChangeLogEntry.id <= entry.id - self.capacity).delete(
+                synchronize_session=False
+            )
+
+    def sync(self):
+        """
+        Appends the events committed (by any worker) since the last sync.
+        The first sync loads the retained tail of the table.
+        """
+        if self.session_factory is None:
+            return
+        with self._sync_lock:
+            with self.session_factory() as db:
+                query = db.query(ChangeLogEntry)
+                if self._loaded:
+                    rows = query.filter(ChangeLogEntry.id > self._last_id).order_by(ChangeLogEntry.id).all()
+                else:
+                    rows = query.order_by(ChangeLogEntry.id.desc()).limit(self.capacity).all()[::-1]
+                    self._loaded = True
+                events = [
+                    ChangeEvent(id=row.id, type=row.type, school_id=row.school_id, data=row.data) for row in rows
+                ]
+            for event in events:
+                self.append(event.type, event.school_id, event.data, id=event.id)
+
+    def append(self, type: str, school_id: Optional[int], data: dict, id: Optional[int] = None
+               ) -> Optional[ChangeEvent]:
+        """
+        Adds an event to the in-memory log and hands it to the subscribers.
+        Without an `id`, the next local id is used (logs without a table).
+        """
+        with self._lock:
+            if id is None:
+                id = self._last_id + 1
+            elif id <= self._last_id:
+                return None
+            self._last_id = id
+            event = ChangeEvent(id=id, type=type, school_id=school_id, data=data)
+            self._events.append(event)
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+        for subscription in subscribers:
+            subscription.offer(event)
+        return event
+
+    def subscribe(self, school_id: Optional[int] = None, last_event_id: Optional[int] = None
+                  ) -> Tuple[Subscription, List[ChangeEvent], bool]:
+        """
+        Registers a subscription on the running event loop and returns it
+        with the retained events after `last_event_id`. The flag is False
+        when events after `last_event_id` were already dropped (or the id
+        comes from before a restart), i.e. the client must refetch its state.
+        """
+        subscription = Subscription(self, school_id, asyncio.get_running_loop(), self.subscriber_buffer)
+        with self._lock:
+            complete = True
+            backlog = []
+            if last_event_id is not None:
+                oldest = self._events[0].id if self._events else self._last_id + 1
+                complete = oldest - 1 <= last_event_id <= self._last_id
+                backlog = [e for e in self._events if e.id > last_event_id and subscription.matches(e)]
+            subscription.last_id = self._last_id
+            self._subscribers.add(subscription)
+        return subscription, backlog, complete
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def resize(self, capacity: int):
+        """
+        Changes how many events are retained, keeping the newest ones.
+        """
+        with self._lock:
+            self.capacity = capacity
+            self._events = deque(self._events, maxlen=capacity)
+
+    def clear(self):
+        with self._sync_lock, self._lock:
+            self._events.clear()
+            self._subscribers.clear()
+            self._last_id = 0
+            self._loaded = False
+
+    def recent(self, school_id: Optional[int] = None) -> List[ChangeEvent]:
+        """
+        Returns the retained events, oldest first, optionally of one school.
+        """
+        with self._lock:
+            return [e for e in self._events if school_id is None or e.school_id == school_id]
+
+    def __len__(self):
+        return len(self._events)
+
+
+log = EventLog(
+    capacity=settings.event_log_capacity,
+    subscriber_buffer=settings.event_subscriber_buffer,
+    session_factory=SessionLocal,
+)
+
+def notify():
+    """
+    Tells every worker (this one included) to sync newly committed events.
+    """
+    invalidation.publish("events")
+
+invalidation.subscribe("events", lambda event: log.sync())
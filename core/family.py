@@ -0,0 +1,128 @@
+"""
+Parent/child family graphs, cached per family.
+
+A family is the set of users connected through `parent_child_association`.
+It is resolved with one recursive CTE plus eager loads (see
+`crud.get_family_links`) and cached as a whole, so any member's view
+(children, siblings, co-parents) is computed from memory. Link changes and
+user/role-assignment writes evict the affected family in every worker via
+the invalidation bus.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core import crud, invalidation, schemas
+
+MAX_CACHED_FAMILIES = 1024
+
+
+@dataclass(frozen=True)
+class Family:
+    members: Dict[int, schemas.FamilyMember]
+    links: FrozenSet[Tuple[int, int]]
+
+    def view(self, user_id: int) -> schemas.FamilyGraph:
+        parents = {p for p, c in self.links if c == user_id}
+        children = {c for p, c in self.links if p == user_id}
+        siblings = {c for p, c in self.links if p in parents} - {user_id}
+        co_parents = {p for p, c in self.links if c in children} - {user_id}
+        return schemas.FamilyGraph(
+            user_id=user_id,
+            parents=sorted(parents),
+            children=sorted(children),
+            siblings=sorted(siblings),
+            co_parents=sorted(co_parents),
+            members=list(self.members.values()),
+        )
+
+
+_lock = threading.Lock()
+# Family key (lowest member id) -> Family, in least-recently-used order
+_families: "OrderedDict[int, Family]" = OrderedDict()
+# Member id -> family key
+_index: Dict[int, int] = {}
+# Bumped on every eviction so that a graph loaded concurrently with a
+# link change is not cached in its stale form
+_generation = 0
+
+def get_family_graph(db: Session, user_id: int) -> Optional[schemas.FamilyGraph]:
+    """
+    Returns the family graph as seen from `user_id`, or None if the user
+    does not exist.
+    """
+    with _lock:
+        key = _index.get(user_id)
+        if key is not None:
+            _families.move_to_end(key)
+            return _families[key].view(user_id)
+        generation = _generation
+
+    member_ids, links = crud.get_family_links(db, user_id)
+    users = crud.get_users_with_family_details(db, member_ids)
+    if not any(user.id == user_id for user in users):
+        return None
+    family = Family(
+        members={user.id: schemas.FamilyMember.model_validate(user) for user in users},
+        links=frozenset(links),
+    )
+    _store(family, generation)
+    return family.view(user_id)
+
+def _store(family: Family, generation: int):
+    key = min(family.members)
+    with _lock:
+        if generation != _generation:
+            return
+        # A member may still point at an older, overlapping family
+        for member_id in family.members:
+            old_key = _index.get(member_id)
+            if old_key is not None and old_key != key:
+                _drop_locked(old_key)
+        _families[key] = family
+        _families.move_to_end(key)
+        for member_id in family.members:
+            _index[member_id] = key
+        while len(_families) > MAX_CACHED_FAMILIES:
+            _drop_locked(next(iter(_families)))
+
+def _drop_locked(key: int):
+    family = _families.pop(key, None)
+    if family is None:
+        return
+    for member_id in family.members:
+        if _index.get(member_id) == key:
+            del _index[member_id]
+
+def evict(user_id: int):
+    """
+    Drops the cached family containing `user_id`, if any.
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        key = _index.get(user_id)
+        if key is not None:
+            _drop_locked(key)
+
+def clear():
+    global _generation
+    with _lock:
+        _generation += 1
+        _families.clear()
+        _index.clear()
+
+
+def _on_invalidation(event: invalidation.InvalidationEvent):
+    if event.key is None:
+        clear()
+    else:
+        evict(int(event.key))
+
+# Link changes, profile updates and role assignments all change what a
+# cached family looks like.
+invalidation.subscribe("family", _on_invalidation)
+invalidation.subscribe("user", _on_invalidation)
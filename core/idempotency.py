@@ -0,0 +1,267 @@
+"""
+Idempotency-Key support for retried POST requests.
+
+Clients send an `Idempotency-Key` header with a POST; the first request
+with a given key runs normally and its response is stored. Retries with the
+same key and the same payload get the stored response replayed (one dict
+lookup, no hashing of passwords or inserts). A retry that arrives while the
+original is still running waits for it instead of executing twice. Reusing
+a key for a different payload is rejected with 422.
+
+Entries live in a bounded, per-process store and expire after a TTL.
+When the store is full, the oldest finished entries make room; entries
+still running are never evicted (their retries would run them again), so a
+store full of them rejects new keys with 503. Server errors (5xx) are not
+stored, so the client can retry them.
+
+The store is not shared between processes: run a single worker, or route
+retries carrying the same key to the same worker (e.g. sticky sessions).
+A retry that lands on another worker executes the request again.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.config import settings
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# POST endpoints that honour the header
+IDEMPOTENT_PATHS = [
+    re.compile(r"^/users/?$"),
+    re.compile(r"^/schools/?$"),
+    re.compile(r"^/schools/\d+/branches/?$"),
+    re.compile(r"^/roles/assign/?$"),
+]
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    headers: Tuple[Tuple[bytes, bytes], ...]
+    body: bytes
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    response: Optional[StoredResponse] = None
+    done: bool = False
+    # Futures of the duplicates waiting for this entry, with their event loops
+    _waiters: list = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Waits (without occupying a thread) until the entry is done.
+        Returns False on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        with self._lock:
+            if self.done:
+                return True
+            self._waiters.append((loop, waiter))
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                if (loop, waiter) in self._waiters:
+                    self._waiters.remove((loop, waiter))
+
+    def finish(self):
+        with self._lock:
+            self.done = True
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiter's event loop is gone
+                pass
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class KeyReusedError(Exception):
+    """The key was already used with a different request payload."""
+
+
+class StoreFullError(Exception):
+    """Every entry of the store is still running, so none can be evicted."""
+
+
+class IdempotencyStore:
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[_Entry, bool]:
+        """
+        Returns the entry for `key` and whether the caller owns it (i.e.
+        must execute the request and then `complete` or `abandon` it).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    raise KeyReusedError(key)
+                return entry, False
+            self._make_room()
+            entry = _Entry(fingerprint=fingerprint, expires_at=now + self.ttl)
+            self._entries[key] = entry
+            return entry, True
+
+    def complete(self, key: str, entry: _Entry, response: StoredResponse):
+        entry.response = response
+        entry.finish()
+
+    def abandon(self, key: str, entry: _Entry):
+        """
+        Forgets an execution that must not be replayed (server error), so
+        that waiters and later retries run the request again.
+        """
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.finish()
+
+    def _evict(self, now: float):
+        # Entries share one TTL, so insertion order is expiry order
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+
+    def _make_room(self):
+        # Drops the oldest finished entries; running ones must stay so that
+        # their retries wait instead of executing again
+        excess = len(self._entries) - self.max_entries + 1
+        if excess <= 0:
+            return
+        victims = []
+        for key, entry in self._entries.items():
+            if entry.done:
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self._entries[key]
+        if len(victims) < excess:
+            raise StoreFullError()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+store = IdempotencyStore(max_entries=settings.idempotency_max_entries, ttl=settings.idempotency_ttl)
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, store: IdempotencyStore = store, wait_timeout: float = None):
+        super().__init__(app)
+        self.store = store
+        self.wait_timeout = settings.idempotency_wait_timeout if wait_timeout is None else wait_timeout
+
+    async def dispatch(self, request: Request, call_next):
+        key = request.headers.get(HEADER)
+        if (
+            key is None
+            or request.method != "POST"
+            or not any(p.match(request.url.path) for p in IDEMPOTENT_PATHS)
+        ):
+            return await call_next(request)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters"},
+            )
+
+        body = await request.body()
+        # Keys are scoped to the caller's credentials and the endpoint
+        scope = hashlib.sha256(
+            "\n".join([request.headers.get("authorization", ""), request.url.path, key]).encode()
+        ).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        while True:
+            try:
+                entry, owner = self.store.begin(scope, fingerprint)
+            except KeyReusedError:
+                return JSONResponse(
+                    status_code=422,
+                    content={"detail": f"{HEADER} was already used with a different request"},
+                )
+            except StoreFullError:
+                return JSONResponse(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    content={"detail": f"Too many requests with an {HEADER} in progress, retry later"},
+                    headers={"Retry-After": "1"},
+                )
+            if owner:
+                return await self._execute(request, call_next, scope, entry)
+            if not entry.done:
+                if not await entry.wait(self.wait_timeout):
+                    return JSONResponse(
+                        status_code=status.HTTP_409_CONFLICT,
+                        content={"detail": "A request with this Idempotency-Key is still in progress"},
+                    )
+            if entry.response is not None:
+                return self._replay(entry.response)
+            # The original failed with a server error: try again ourselves
+
+    async def _execute(self, request: Request, call_next, scope: str, entry: _Entry) -> Response:
+        try:
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        except BaseException:
+            self.store.abandon(scope, entry)
+            raise
+        if response.status_code >= 500:
+            self.store.abandon(scope, entry)
+        else:
+            self.store.complete(scope, entry, StoredResponse(
+                status_code=response.status_code,
+                headers=tuple(
+                    (name, value) for name, value in response.raw_headers if name != b"content-length"
+                ),
+                body=body,
+            ))
+        fresh = Response(content=body, status_code=response.status_code, background=response.background)
+        fresh.raw_headers = list(response.raw_headers)
+        return fresh
+
+    @staticmethod
+    def _replay(stored: StoredResponse) -> Response:
+        response = Response(content=stored.body, status_code=stored.status_code)
+        response.raw_headers.extend(stored.headers)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
@@ -0,0 +1,385 @@
+"""
+Cross-worker cache invalidation bus.
+
+Every uvicorn worker keeps its own in-process caches (see `core.reference`).
+When a CRUD write runs in one worker, it publishes a small, versioned
+invalidation event; the configured backend fans it out so that every other
+worker can evict the matching entries.
+
+Backends:
+- `InMemoryBackend`: single process, nothing leaves the process (default).
+- `SQLiteBackend`: workers on one host share an append-only event table in a
+  SQLite file and poll it every few milliseconds.
+- `RedisBackend`: PUBLISH/SUBSCRIBE over the Redis wire protocol, so any
+  Redis-compatible server (or a local stand-in) can carry the events.
+  Events are queued and published by a background thread, so a slow or
+  unreachable server never holds up the request that made the write.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class InvalidationEvent:
+    topic: str
+    key: Optional[str]
+    version: int
+    origin: str
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload) -> "InvalidationEvent":
+        return cls(**json.loads(payload))
+
+
+Deliver = Callable[[InvalidationEvent], None]
+
+
+# --- Backends ---
+
+class InMemoryBackend:
+    """
+    Single-process backend: local subscribers are notified by `publish`
+    itself, so there is nothing to forward.
+    """
+    def start(self, deliver: Deliver):
+        pass
+
+    def send(self, event: InvalidationEvent):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """
+    Single-host backend: events are appended to a table in a shared SQLite
+    file and every worker polls for rows newer than the last one it saw.
+    """
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS invalidation_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def start(self, deliver: Deliver):
+        reader = self._connect()
+        # Only events published after this worker started are relevant
+        last_id = reader.execute("SELECT COALESCE(MAX(id), 0) FROM invalidation_events").fetchone()[0]
+        self._thread = threading.Thread(
+            target=self._poll, args=(reader, last_id, deliver), name="invalidation-sqlite", daemon=True
+        )
+        self._thread.start()
+
+    def _poll(self, reader: sqlite3.Connection, last_id: int, deliver: Deliver):
+        try:
+            while not self._stop.wait(self.poll_interval):
+                try:
+                    rows = reader.execute(
+                        "SELECT id, payload FROM invalidation_events WHERE id > ? ORDER BY id", (last_id,)
+                    ).fetchall()
+                except sqlite3.Error:
+                    logger.exception("Polling the invalidation table failed")
+                    continue
+                for row_id, payload in rows:
+                    last_id = row_id
+                    deliver(InvalidationEvent.from_json(payload))
+        finally:
+            reader.close()
+
+    def send(self, event: InvalidationEvent):
+        now = time.time()
+        with self._write_lock:
+            self._writer.execute(
+                "INSERT INTO invalidation_events (payload, created) VALUES (?, ?)", (event.to_json(), now)
+            )
+            # Keep the table small; pollers only ever look a few ms back
+            if event.version % 100 == 0:
+                self._writer.execute("DELETE FROM invalidation_events WHERE created < ?", (now - self.retention,))
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        with self._write_lock:
+            self._writer.close()
+
+
+class RedisBackend:
+    """
+    Multi-host backend speaking just enough of the Redis protocol (RESP) for
+    PUBLISH and SUBSCRIBE, so no client library is required.
+    `send` only queues the event; a publisher thread sends them in order.
+    When the queue is full (the server has been unreachable for a while),
+    new events are dropped and counted.
+    """
+    def __init__(self, host: str = "localhost", port: int = 6379, channel: str = "invalidation",
+                 reconnect_delay: float = 0.5, queue_capacity: int = 10000):
+        self.host = host
+        self.port = port
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_capacity)
+        self.dropped = 0
+        self._publisher: Optional[socket.socket] = None
+        self._publisher_file = None
+        self._publish_lock = threading.Lock()
+        self._publisher_thread: Optional[threading.Thread] = None
+        self._subscriber: Optional[socket.socket] = None
+        self._stop = threading.Event()
+        self._subscribed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # RESP encoding / decoding
+    @staticmethod
+    def _encode(*args: str) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg.encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    @classmethod
+    def _read(cls, f):
+        line = f.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise ConnectionError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = f.read(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            return [cls._read(f) for _ in range(int(rest))]
+        raise ConnectionError(f"Unexpected RESP reply: {line!r}")
+
+    def _connect(self) -> socket.socket:
+        return socket.create_connection((self.host, self.port), timeout=5)
+
+    def start(self, deliver: Deliver):
+        self._publisher_thread = threading.Thread(
+            target=self._publish_queued, name="invalidation-redis-publisher", daemon=True
+        )
+        self._publisher_thread.start()
+        self._thread = threading.Thread(
+            target=self._listen, args=(deliver,), name="invalidation-redis", daemon=True
+        )
+        self._thread.start()
+        # Events published before SUBSCRIBE is acknowledged would be missed
+        self._subscribed.wait(timeout=5)
+
+    def _listen(self, deliver: Deliver):
+        while not self._stop.is_set():
+            try:
+                sock = self._connect()
+                sock.settimeout(None)
+                self._subscriber = sock
+                f = sock.makefile("rb")
+                sock.sendall(self._encode("SUBSCRIBE", self.channel))
+                self._read(f)
+                self._subscribed.set()
+                while not self._stop.is_set():
+                    message = self._read(f)
+                    if isinstance(message, list) and message and message[0] == "message":
+                        deliver(InvalidationEvent.from_json(message[2]))
+            except (OSError, ConnectionError, ValueError):
+                if self._stop.is_set():
+                    break
+                logger.warning("Invalidation subscriber disconnected, reconnecting", exc_info=True)
+                self._stop.wait(self.reconnect_delay)
+
+    def send(self, event: InvalidationEvent):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Invalidation queue full, dropped %s", event)
+
+    def _publish_queued(self):
+        # Runs until closed, then sends whatever is still queued
+        while True:
+            try:
+                event = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if not self._publish(event) and not self._stop.is_set():
+                self._stop.wait(self.reconnect_delay)
+
+    def _publish(self, event: InvalidationEvent) -> bool:
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect()
+                        self._publisher_file = self._publisher.makefile("rb")
+                    self._publisher.sendall(self._encode("PUBLISH", self.channel, event.to_json()))
+                    self._read(self._publisher_file)
+                    return True
+                except (OSError, ConnectionError):
+                    self._close_publisher()
+                    if attempt:
+                        logger.exception("Could not publish invalidation event %s", event)
+        return False
+
+    def _close_publisher(self):
+        if self._publisher is not None:
+            self._publisher.close()
+        self._publisher = None
+        self._publisher_file = None
+
+    def close(self):
+        self._stop.set()
+        if self._publisher_thread is not None:
+            self._publisher_thread.join(timeout=1)
+        if self._subscriber is not None:
+            try:
+                self._subscriber.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._subscriber.close()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        with self._publish_lock:
+            self._close_publisher()
+
+
+def create_backend(url: str, poll_interval: float = None):
+    """
+    Builds a backend from a URL such as "memory://", "sqlite:///./bus.db"
+    or "redis://localhost:6379/invalidation".
+    SQLite URLs follow SQLAlchemy: three slashes for a relative path
+    ("sqlite:///./bus.db"), four for an absolute one ("sqlite:////tmp/bus.db").
+    """
+    parsed = urlparse(url)
+    if poll_interval is None:
+        poll_interval = settings.invalidation_poll_interval
+    if parsed.scheme == "memory":
+        return InMemoryBackend()
+    if parsed.scheme == "sqlite":
+        # Drop the slash separating the (empty) host from the path
+        path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+        return SQLiteBackend(path, poll_interval=poll_interval)
+    if parsed.scheme == "redis":
+        return RedisBackend(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            channel=parsed.path.lstrip("/") or "invalidation",
+        )
+    raise ValueError(f"Unsupported invalidation bus URL: {url}")
+
+
+# --- Bus state ---
+
+# Identifies this worker; events carrying it were already applied locally.
+origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_versions = itertools.count(1)
+# Held while an event is numbered and handed to the backend, so events
+# leave in version order (receivers drop versions older than the last seen)
+_publish_lock = threading.Lock()
+_subscribers: dict = defaultdict(list)
+_seen_versions: dict = {}
+_seen_lock = threading.Lock()
+_backend = InMemoryBackend()
+
+def subscribe(topic: str, callback: Callable[[InvalidationEvent], None], remote_only: bool = False):
+    """
+    Registers `callback` for events on `topic`.
+    With `remote_only`, events published by this worker are skipped; use it
+    for caches that the write path already updates in place.
+    """
+    _subscribers[topic].append((callback, remote_only))
+
+def publish(topic: str, key=None) -> InvalidationEvent:
+    """
+    Publishes an invalidation for `key` (or the whole topic when None) to
+    local subscribers and to every other worker.
+    """
+    with _publish_lock:
+        event = InvalidationEvent(
+            topic=topic, key=None if key is None else str(key), version=next(_versions), origin=origin
+        )
+        try:
+            _backend.send(event)
+        except Exception:
+            logger.exception("Could not send invalidation event %s", event)
+    _dispatch(event, local=True)
+    return event
+
+def deliver(event: InvalidationEvent):
+    """
+    Entry point for events received from the backend.
+    Own events and replays of already seen versions are dropped.
+    """
+    if event.origin == origin:
+        return
+    with _seen_lock:
+        if event.version <= _seen_versions.get(event.origin, 0):
+            return
+        _seen_versions[event.origin] = event.version
+    _dispatch(event, local=False)
+
+def _dispatch(event: InvalidationEvent, local: bool):
+    for callback, remote_only in list(_subscribers[event.topic]):
+        if local and remote_only:
+            continue
+        try:
+            callback(event)
+        except Exception:
+            logger.exception("Invalidation subscriber failed for %s", event)
+
+def configure(url: str = None, poll_interval: float = None):
+    """
+    Replaces the active backend (closing the previous one) and starts it.
+    """
+    global _backend
+    close()
+    _backend = create_backend(url or settings.invalidation_bus_url, poll_interval=poll_interval)
+    _backend.start(deliver)
+    return _backend
+
+def close():
+    global _backend
+    _backend.close()
+    _backend = InMemoryBackend()
@@ -0,0 +1,327 @@
+"""
+In-process background job runner backed by the `jobs` table.
+
+API workers only insert a job row and return its id; a bounded thread pool
+picks the job up, runs the registered handler and records progress,
+retries and the final result in the same row, so status survives restarts
+and can be polled from any worker.
+
+Several workers may share the table: a job is claimed with a single
+conditional UPDATE, so exactly one worker runs each attempt. The claiming
+worker renews the job's lease (`updated_at`) while the job runs; jobs whose
+lease has expired belonged to a worker that died and are queued again.
+
+Handlers receive their own session, the job parameters and a
+`progress(done, total)` callback that also commits that session. The
+session's `info["submitted_by"]` is the id of the user who submitted the
+job, to attribute the handler's writes in the audit log. Handlers may
+be retried after a failure, so they must be safe to run again on partially
+completed work.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core import crud, schemas
+from core.config import settings
+from core.database import SessionLocal
+from core.models import Branch, Job, Role
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+Handler = Callable[[Session, dict, Callable[[int, Optional[int]], None]], Optional[dict]]
+_handlers: Dict[str, Handler] = {}
+
+def handler(kind: str):
+    """
+    Registers the decorated function as the handler for jobs of `kind`.
+    """
+    def register(fn: Handler) -> Handler:
+        _handlers[kind] = fn
+        return fn
+    return register
+
+def _redact(value):
+    """
+    Masks password fields; applied to the stored parameters once a job can
+    no longer be retried.
+    """
+    if isinstance(value, dict):
+        return {k: "***" if "password" in k else _redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    return value
+
+
+class JobRunner:
+    def __init__(self, session_factory: Callable[[], Session], max_workers: int = 4, retry_delay: float = 5.0,
+                 lease: float = 300.0, eager: bool = False):
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.retry_delay = retry_delay
+        self.lease = lease
+        # Run jobs inline in the submitting thread (tests and scripts)
+        self.eager = eager
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopped = False
+        # Jobs this runner is executing, whose leases it renews
+        self._running: set = set()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Re-queues jobs whose worker died, dispatches everything that is
+        waiting and starts renewing the leases of the jobs run here.
+        """
+        self._stopped = False
+        self._stop.clear()
+        self.requeue_expired()
+        with self.session_factory() as db:
+            job_ids = [job_id for (job_id,) in db.query(Job.id).filter(Job.status == QUEUED).order_by(Job.id)]
+        for job_id in job_ids:
+            self._dispatch(job_id)
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="job-leases", daemon=True)
+        self._heartbeat.start()
+
+    def stop(self):
+        """
+        Stops dispatching and drops jobs that have not started; they stay
+        queued in the table and are picked up by `start` on the next boot
+        (or by another worker). Jobs still running here lose their lease.
+        """
+        self._stopped = True
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+            self._heartbeat = None
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def requeue_expired(self):
+        """
+        Queues again the running jobs whose lease has expired, i.e. whose
+        worker stopped renewing it, and dispatches them here.
+        """
+        # updated_at is set by the database (CURRENT_TIMESTAMP, UTC)
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.lease)
+        expired = (Job.status == RUNNING, Job.updated_at < cutoff)
+        with self.session_factory() as db:
+            job_ids = [job_id for (job_id,) in db.query(Job.id).filter(*expired)]
+            requeued = [
+                job_id for job_id in job_ids
+                # Conditional, so a lease renewed meanwhile is respected
+                if db.query(Job).filter(Job.id == job_id, *expired).update(
+                    {Job.status: QUEUED}, synchronize_session=False
+                )
+            ]
+            db.commit()
+        for job_id in requeued:
+            logger.warning("Job %s lost its worker, queued again", job_id)
+            self._dispatch(job_id)
+
+    def _renew_leases(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                with self._lock:
+                    running = list(self._running)
+                if running:
+                    with self.session_factory() as db:
+                        db.query(Job).filter(Job.id.in_(running), Job.status == RUNNING).update(
+                            {Job.updated_at: func.now()}, synchronize_session=False
+                        )
+                        db.commit()
+                self.requeue_expired()
+            except Exception:
+                logger.exception("Renewing job leases failed")
+
+    def submit(self, db: Session, kind: str, params: dict, submitted_by: Optional[int] = None,
+               max_attempts: int = 3) -> schemas.Job:
+        if kind not in _handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind, params=params, status=QUEUED, max_attempts=max_attempts, submitted_by=submitted_by)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        submitted = schemas.Job.model_validate(job)
+        # End the read transaction before the job starts
+        db.commit()
+        self._dispatch(submitted.id)
+        return submitted
+
+    def _dispatch(self, job_id: int, delay: float = 0):
+        if self.eager:
+            self._execute(job_id)
+            return
+        if self._stopped:
+            return
+        if delay:
+            timer = threading.Timer(delay, self._dispatch, args=(job_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        with self._lock:
+            # At most `max_workers` jobs execute at once; the rest wait in the pool's queue
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            self._executor.submit(self._execute, job_id)
+
+    def _execute(self, job_id: int):
+        with self.session_factory() as db:
+            # Only one worker's UPDATE can match a queued job
+            claimed = db.query(Job).filter(Job.id == job_id, Job.status == QUEUED).update(
+                {Job.status: RUNNING, Job.attempts: Job.attempts + 1, Job.updated_at: func.now()},
+                synchronize_session=False,
+            )
+            db.commit()
+            if not claimed:
+                return
+            job = db.get(Job, job_id)
+            kind, params = job.kind, dict(job.params)
+            attempts, max_attempts = job.attempts, job.max_attempts
+            submitted_by = job.submitted_by
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            self._run(job_id, kind, params, attempts, max_attempts, submitted_by)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _run(self, job_id: int, kind: str, params: dict, attempts: int, max_attempts: int,
+             submitted_by: Optional[int]):
+        try:
+            with self.session_factory() as work_db:
+                work_db.info["submitted_by"] = submitted_by
+                def progress(done: int, total: Optional[int] = None):
+                    # Shares (and commits) the handler's session, so a single
+                    # connection is used and no transaction waits on another.
+                    values = {Job.progress: done}
+                    if total is not None:
+                        values[Job.total] = total
+                    work_db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+                    work_db.commit()
+
+                result = _handlers[kind](work_db, params, progress)
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed on attempt %s", job_id, kind, attempts)
+            error = f"{type(exc).__name__}: {exc}"
+            if attempts < max_attempts:
+                if self._update(job_id, attempts, {Job.status: QUEUED, Job.error: error}):
+                    self._dispatch(job_id, delay=self.retry_delay * 2 ** (attempts - 1))
+                return
+            self._update(job_id, attempts, {Job.status: FAILED, Job.error: error, Job.params: _redact(params)})
+        else:
+            self._update(job_id, attempts, {
+                Job.status: SUCCEEDED,
+                Job.result: result,
+                Job.error: None,
+                Job.params: _redact(params),
+                Job.progress: func.coalesce(Job.total, Job.progress),
+            })
+
+    def _update(self, job_id: int, attempts: int, values: dict) -> bool:
+        """
+        Records the outcome of an attempt, unless the job was re-queued (its
+        lease expired) and claimed again in the meantime.
+        """
+        with self.session_factory() as db:
+            updated = db.query(Job).filter(
+                Job.id == job_id, Job.status == RUNNING, Job.attempts == attempts
+            ).update(values, synchronize_session=False)
+            db.commit()
+        return bool(updated)
+
+    def wait(self, job_id: int, timeout: float = 30.0) -> Optional[str]:
+        """
+        Blocks until the job reaches a final state and returns it
+        (None on timeout). Meant for scripts and tests.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.session_factory() as db:
+                job = db.get(Job, job_id)
+                if job is not None and job.status in (SUCCEEDED, FAILED):
+                    return job.status
+            time.sleep(0.02)
+        return None
+
+
+runner = JobRunner(
+    SessionLocal, max_workers=settings.job_workers, retry_delay=settings.job_retry_delay, lease=settings.job_lease
+)
+
+
+# --- Built-in handlers ---
+
+@handler("provision_school")
+def provision_school(db: Session, params: dict, progress) -> dict:
+    """
+    Creates a school with its branches, roles and admin users.
+    Anything that already exists (from an earlier attempt) is reused.
+    """
+    request = schemas.SchoolProvisionParams(**params)
+    actor_id = db.info.get("submitted_by")
+    total = 1 + len(request.branches) + len(request.roles) + len(request.admins)
+    done = 0
+
+    school = crud.get_school_by_name(db, name=request.name)
+    if school is None:
+        school = crud.create_school(db, schemas.SchoolCreate(name=request.name), actor_id=actor_id)
+    done += 1
+    progress(done, total)
+
+    branches = []
+    for branch in request.branches:
+        db_branch = db.query(Branch).filter(Branch.school_id == school.id, Branch.name == branch.name).first()
+        if db_branch is None:
+            db_branch = crud.create_branch_for_school(db, branch, school_id=school.id, actor_id=actor_id)
+        branches.append(db_branch)
+        done += 1
+        progress(done, total)
+
+    roles = {}
+    for role in request.roles:
+        db_role = db.query(Role).filter(Role.school_id == school.id, Role.name == role.name).first()
+        if db_role is None:
+            db_role = crud.create_role(db, role, school_id=school.id, actor_id=actor_id)
+        roles[role.name] = db_role
+        done += 1
+        progress(done, total)
+
+    admin_role = roles.get(request.admin_role)
+    admin_ids = []
+    for admin in request.admins:
+        user = crud.get_user_by_email(db, email=admin.email)
+        if user is None:
+            user = crud.create_user_with_hash(db, admin, admin.hashed_password, actor_id=actor_id)
+        if admin_role is not None:
+            assigned = {a.branch_id for a in user.role_assignments if a.role_id == admin_role.id}
+            for branch in branches:
+                if branch.id not in assigned:
+                    crud.assign_role_to_user(
+                        db,
+                        schemas.UserRoleAssignmentCreate(user_id=user.id, role_id=admin_role.id, branch_id=branch.id),
+                        actor_id=actor_id,
+                    )
+        admin_ids.append(user.id)
+        done += 1
+        progress(done, total)
+
+    return {
+        "school_id": school.id,
+        "branch_ids": [b.id for b in branches],
+        "role_ids": {name: r.id for name, r in roles.items()},
+        "admin_user_ids": admin_ids,
+    }
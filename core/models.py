@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, ForeignKey, Table
+    Column, Integer, String, Boolean, ForeignKey, Table, JSON, DateTime, func
 )
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -104,3 +104,63 @@ class ParentProfile(Base):
     # Add parent-specific fields here in the future
 
     user = relationship("User", back_populates="parent_profile")
+
+# --- Summary tables (maintained incrementally by core.stats) ---
+
+class SchoolStats(Base):
+    __tablename__ = 'school_stats'
+    school_id = Column(Integer, ForeignKey('schools.id'), primary_key=True)
+    branch_count = Column(Integer, nullable=False, default=0)
+    active_user_count = Column(Integer, nullable=False, default=0, comment="Active users with at least one role assignment in the school")
+    inactive_user_count = Column(Integer, nullable=False, default=0)
+
+class SchoolRoleStats(Base):
+    __tablename__ = 'school_role_stats'
+    school_id = Column(Integer, ForeignKey('schools.id'), primary_key=True)
+    role_id = Column(Integer, ForeignKey('roles.id'), primary_key=True)
+    user_count = Column(Integer, nullable=False, default=0)
+
+class BranchStats(Base):
+    __tablename__ = 'branch_stats'
+    branch_id = Column(Integer, ForeignKey('branches.id'), primary_key=True)
+    school_id = Column(Integer, ForeignKey('schools.id'), nullable=False, index=True)
+    user_count = Column(Integer, nullable=False, default=0)
+
+
+# --- Background jobs (see core.jobs) ---
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False, comment="Registered handler name, e.g. 'provision_school'")
+    status = Column(String, nullable=False, default="queued", index=True, comment="queued, running, succeeded or failed")
+    params = Column(JSON, nullable=False)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    submitted_by = Column(Integer, ForeignKey('users.id'), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+class AuditLogEntry(Base):
+    __tablename__ = 'audit_log'
+    # Append-only: rows are inserted in batches by core.audit and never updated
+    id = Column(Integer, primary_key=True, index=True)
+    occurred_at = Column(DateTime, nullable=False, index=True)
+    actor_id = Column(Integer, nullable=True, index=True, comment="User who made the change; NULL for anonymous calls")
+    action = Column(String, nullable=False, comment="e.g. 'school.created', 'role.assigned'")
+    entity_type = Column(String, nullable=False)
+    entity_id = Column(String, nullable=False)
+    data = Column(JSON, nullable=False)
+
+class ChangeLogEntry(Base):
+    __tablename__ = 'change_events'
+    # Shared by all workers; ids are the event ids of the change feed (core.events)
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String, nullable=False, comment="e.g. 'school.created', 'role.assigned'")
+    school_id = Column(Integer, nullable=True)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,208 @@
+"""
+In-process snapshot of the read-mostly reference tree:
+School -> Branch and Role -> Permission.
+
+The snapshot is a set of frozen, slotted objects that is never mutated in
+place. Readers grab the current snapshot without locking; writers build a
+new snapshot from the old one and swap the module-level reference under a
+lock (copy-on-write), so a reader always sees a complete, consistent tree.
+Writes made by other workers arrive as "reference" invalidation events and
+simply drop the snapshot, which is rebuilt on the next read. A snapshot
+older than `max_age` seconds is rebuilt as well, so a worker that misses
+those events (or runs without a shared bus) is never stale for long.
+
+The school and role read endpoints (GET /schools, GET /roles and their
+by-id variants) are served from the snapshot without a database round-trip.
+"""
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from core import invalidation
+from core.config import settings
+from core.models import Branch, Permission, Role, School
+
+
+@dataclass(frozen=True, slots=True)
+class BranchNode:
+    id: int
+    name: str
+    school_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class SchoolNode:
+    id: int
+    name: str
+    branches: Tuple[BranchNode, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class PermissionNode:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class RoleNode:
+    id: int
+    name: str
+    school_id: Optional[int] = None
+    permissions: Tuple[PermissionNode, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ReferenceSnapshot:
+    schools: Mapping[int, SchoolNode]
+    roles: Mapping[int, RoleNode]
+    # When the tree was read from the database; kept by copy-on-write updates
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > max_age
+
+    def list_schools(self, skip: int = 0, limit: int = 100) -> Tuple[SchoolNode, ...]:
+        return tuple(self.schools.values())[skip:skip + limit]
+
+    def list_roles(self, skip: int = 0, limit: int = 100) -> Tuple[RoleNode, ...]:
+        return tuple(self.roles.values())[skip:skip + limit]
+
+
+# --- Node builders ---
+
+def _branch_node(branch: Branch) -> BranchNode:
+    return BranchNode(id=branch.id, name=branch.name, school_id=branch.school_id)
+
+def _school_node(school: School) -> SchoolNode:
+    branches = sorted(school.branches, key=lambda b: b.id)
+    return SchoolNode(
+        id=school.id,
+        name=school.name,
+        branches=tuple(_branch_node(b) for b in branches),
+    )
+
+def _permission_node(permission: Permission) -> PermissionNode:
+    return PermissionNode(id=permission.id, name=permission.name)
+
+def _role_node(role: Role) -> RoleNode:
+    permissions = sorted(role.permissions, key=lambda p: p.id)
+    return RoleNode(
+        id=role.id,
+        name=role.name,
+        school_id=role.school_id,
+        permissions=tuple(_permission_node(p) for p in permissions),
+    )
+
+def _freeze(nodes) -> Mapping:
+    return MappingProxyType({node.id: node for node in sorted(nodes, key=lambda n: n.id)})
+
+
+# --- Snapshot state ---
+
+_lock = threading.Lock()
+_snapshot: Optional[ReferenceSnapshot] = None
+max_age = settings.reference_max_age
+
+def build_snapshot(db: Session) -> ReferenceSnapshot:
+    """
+    Reads the whole reference tree in two queries (plus one per eager-loaded
+    collection) and returns it as an immutable snapshot.
+    """
+    schools = db.query(School).options(selectinload(School.branches)).all()
+    roles = db.query(Role).options(selectinload(Role.permissions)).all()
+    return ReferenceSnapshot(
+        schools=_freeze(_school_node(s) for s in schools),
+        roles=_freeze(_role_node(r) for r in roles),
+    )
+
+def load(db: Session) -> ReferenceSnapshot:
+    """
+    (Re)builds the snapshot from the database and makes it current.
+    """
+    with _lock:
+        return _load_locked(db)
+
+def get_snapshot(db: Session) -> ReferenceSnapshot:
+    """
+    Returns the current snapshot, building it from `db` on first use
+    (e.g. when the startup hook did not run or the snapshot was reset) and
+    once it is older than `max_age`.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and not snapshot.is_expired():
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.is_expired():
+            return _load_locked(db)
+        return _snapshot
+
+def _load_locked(db: Session) -> ReferenceSnapshot:
+    global _snapshot
+    _snapshot = build_snapshot(db)
+    return _snapshot
+
+def reset():
+    """
+    Drops the current snapshot; the next read rebuilds it from the database.
+    """
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+def _swap(update):
+    """
+    Atomically replaces the snapshot with `update(snapshot)`.
+    If no snapshot is loaded yet there is nothing to patch: the next read
+    builds a fresh one that already includes the committed write.
+    """
+    global _snapshot
+    with _lock:
+        if _snapshot is not None:
+            _snapshot = update(_snapshot)
+
+
+# --- Copy-on-write updates (call after the write is committed) ---
+
+def add_school(school: School):
+    node = _school_node(school)
+
+    def update(snapshot: ReferenceSnapshot) -> ReferenceSnapshot:
+        schools = dict(snapshot.schools)
+        schools[node.id] = node
+        return replace(snapshot, schools=_freeze(schools.values()))
+
+    _swap(update)
+
+def add_branch(branch: Branch):
+    node = _branch_node(branch)
+
+    def update(snapshot: ReferenceSnapshot) -> ReferenceSnapshot:
+        school = snapshot.schools.get(node.school_id)
+        if school is None:
+            return snapshot
+        branches = tuple(b for b in school.branches if b.id != node.id) + (node,)
+        schools = dict(snapshot.schools)
+        schools[school.id] = replace(school, branches=branches)
+        return replace(snapshot, schools=_freeze(schools.values()))
+
+    _swap(update)
+
+def add_role(role: Role):
+    node = _role_node(role)
+
+    def update(snapshot: ReferenceSnapshot) -> ReferenceSnapshot:
+        roles = dict(snapshot.roles)
+        roles[node.id] = node
+        return replace(snapshot, roles=_freeze(roles.values()))
+
+    _swap(update)
+
+
+def _on_remote_invalidation(event: invalidation.InvalidationEvent):
+    reset()
+
+invalidation.subscribe("reference", _on_remote_invalidation, remote_only=True)
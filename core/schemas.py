@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Optional
 
 # --- Token Schemas ---
 class Token(BaseModel):
@@ -20,6 +21,14 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+# --- Permission Schemas ---
+class Permission(BaseModel):
+    id: int
+    name: str
+
+    class Config:
+        from_attributes = True
+
 # --- Role Schemas ---
 class RoleBase(BaseModel):
     name: str
@@ -30,6 +39,7 @@ class RoleCreate(RoleBase):
 class Role(RoleBase):
     id: int
     school_id: Optional[int] = None
+    permissions: list[Permission] = []
 
     class Config:
         from_attributes = True
@@ -54,6 +64,10 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     phone_number: Optional[str] = None
 
+# Schema for activating/deactivating a user
+class UserActivation(BaseModel):
+    is_active: bool
+
 # Schema for reading a user (response)
 class User(UserBase):
     id: int
@@ -94,3 +108,122 @@ class School(SchoolBase):
 
     class Config:
         from_attributes = True
+
+
+# --- School Statistics Schemas ---
+class RoleUserCount(BaseModel):
+    role_id: int
+    user_count: int
+
+class BranchUserCount(BaseModel):
+    branch_id: int
+    user_count: int
+
+class SchoolStats(BaseModel):
+    school_id: int
+    branch_count: int
+    active_users: int
+    inactive_users: int
+    users_per_role: list[RoleUserCount] = []
+    users_per_branch: list[BranchUserCount] = []
+
+
+# --- Family Schemas ---
+class Profile(BaseModel):
+    user_id: int
+
+    class Config:
+        from_attributes = True
+
+class RoleSummary(RoleBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class FamilyRoleAssignment(UserRoleAssignment):
+    role: RoleSummary
+    branch: Branch
+
+class FamilyMember(UserBase):
+    id: int
+    is_active: bool
+    student_profile: Optional[Profile] = None
+    teacher_profile: Optional[Profile] = None
+    parent_profile: Optional[Profile] = None
+    role_assignments: list[FamilyRoleAssignment] = []
+
+    class Config:
+        from_attributes = True
+
+class FamilyGraph(BaseModel):
+    user_id: int
+    parents: list[int] = []
+    children: list[int] = []
+    siblings: list[int] = []
+    co_parents: list[int] = []
+    # Every member reachable through parent/child links, including the user
+    members: list[FamilyMember] = []
+
+
+# --- Background Job Schemas ---
+class SchoolProvision(BaseModel):
+    name: str
+    branches: list[BranchCreate] = [BranchCreate(name="Main Campus")]
+    roles: list[RoleCreate] = [
+        RoleCreate(name="Admin"),
+        RoleCreate(name="Teacher"),
+        RoleCreate(name="Student"),
+        RoleCreate(name="Parent"),
+    ]
+    # Role given to every admin user in every branch
+    admin_role: str = "Admin"
+    admins: list[UserCreate] = []
+
+# An admin as stored in the job's parameters: the API hashes the password
+# before the job row is inserted, so it is never persisted in clear text
+class ProvisionedAdmin(UserBase):
+    hashed_password: str
+
+class SchoolProvisionParams(SchoolProvision):
+    admins: list[ProvisionedAdmin] = []
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: int
+    total: Optional[int] = None
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# --- Audit Log Schemas ---
+class AuditLogEntry(BaseModel):
+    id: int
+    occurred_at: datetime
+    actor_id: Optional[int] = None
+    action: str
+    entity_type: str
+    entity_id: str
+    data: dict
+
+    class Config:
+        from_attributes = True
+
+class AuditMetrics(BaseModel):
+    queue_depth: int
+    queue_capacity: int
+    written: int
+    dropped: int
+    failed_flushes: int
+    last_flush_seconds: Optional[float] = None
+    avg_flush_seconds: Optional[float] = None
+    max_flush_seconds: Optional[float] = None
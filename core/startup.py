@@ -0,0 +1,64 @@
+"""
+Start-up profiling.
+
+`StartupProfiler` times every import and initialisation step that
+`create_app` and its lifespan perform, so slow cold starts can be traced
+to a module or a warm-up step. The report is logged once the app is ready
+and served by GET /health.
+"""
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StartupStep:
+    name: str
+    seconds: float
+    # Modules loaded for the first time during the step
+    modules_loaded: int = 0
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.steps: List[StartupStep] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def measure(self, name: str):
+        before = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append(StartupStep(
+                name=name,
+                seconds=time.perf_counter() - start,
+                modules_loaded=max(len(sys.modules) - before, 0),
+            ))
+
+    def import_module(self, name: str):
+        with self.measure(f"import {name}"):
+            return importlib.import_module(name)
+
+    def report(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "steps": [
+                {**asdict(step), "seconds": round(step.seconds, 4)}
+                for step in sorted(self.steps, key=lambda s: s.seconds, reverse=True)
+            ],
+        }
+
+    def log(self):
+        report = self.report()
+        lines = [f"Ready in {report['total_seconds']:.3f}s"]
+        for step in report["steps"]:
+            lines.append(f"  {step['seconds']:8.4f}s  {step['modules_loaded']:4d} modules  {step['name']}")
+        logger.info("\n".join(lines))
@@ -0,0 +1,226 @@
+"""
+Per-school statistics kept in summary tables.
+
+The CRUD write paths adjust the counters inside their own transaction
+(`school_created`, `branch_created`, `role_assigned`, `activation_changed`),
+so reading a school's dashboard is a primary-key lookup instead of an
+aggregate scan over users, assignments and branches. A periodic
+reconciliation recomputes everything from the source tables to repair any
+drift (e.g. rows written before the summary tables existed).
+
+A user counts towards a school (and a role or branch within it) once,
+however many assignments they have there.
+"""
+import logging
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core import schemas
+from core.models import (
+    Branch, BranchStats, SchoolRoleStats, SchoolStats, School, User, UserRoleAssignment
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _bump(db: Session, model, keys: dict, **deltas):
+    """
+    Atomically adds `deltas` to the counters of the row identified by
+    `keys`, creating the row if it does not exist yet.
+    """
+    query = db.query(model).filter_by(**keys)
+    updated = query.update(
+        {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()},
+        synchronize_session=False,
+    )
+    if not updated:
+        db.add(model(**keys, **{column: max(delta, 0) for column, delta in deltas.items()}))
+        db.flush()
+
+
+def _in_school(db: Session, user_id: int, school_id: int, exclude_assignment_id: int, *criteria) -> bool:
+    return db.query(
+        db.query(UserRoleAssignment)
+        .join(Branch, Branch.id == UserRoleAssignment.branch_id)
+        .filter(
+            UserRoleAssignment.user_id == user_id,
+            UserRoleAssignment.id != exclude_assignment_id,
+            Branch.school_id == school_id,
+            *criteria,
+        )
+        .exists()
+    ).scalar()
+
+
+# --- Incremental maintenance (called by core.crud before commit) ---
+
+def school_created(db: Session, school: School):
+    db.add(SchoolStats(school_id=school.id, branch_count=0, active_user_count=0, inactive_user_count=0))
+
+def branch_created(db: Session, branch: Branch):
+    _bump(db, SchoolStats, {"school_id": branch.school_id}, branch_count=1)
+    db.add(BranchStats(branch_id=branch.id, school_id=branch.school_id, user_count=0))
+
+def role_assigned(db: Session, assignment: UserRoleAssignment):
+    """
+    Counts the user of a freshly flushed assignment towards its branch,
+    role and school unless they were already counted there.
+    """
+    branch = db.get(Branch, assignment.branch_id)
+    user = db.get(User, assignment.user_id)
+    if branch is None or user is None:
+        return
+    school_id = branch.school_id
+
+    if not _in_school(db, user.id, school_id, assignment.id, UserRoleAssignment.branch_id == branch.id):
+        _bump(db, BranchStats, {"branch_id": branch.id, "school_id": school_id}, user_count=1)
+    if not _in_school(db, user.id, school_id, assignment.id, UserRoleAssignment.role_id == assignment.role_id):
+        _bump(db, SchoolRoleStats, {"school_id": school_id, "role_id": assignment.role_id}, user_count=1)
+    if not _in_school(db, user.id, school_id, assignment.id):
+        if user.is_active is False:
+            _bump(db, SchoolStats, {"school_id": school_id}, inactive_user_count=1)
+        else:
+            _bump(db, SchoolStats, {"school_id": school_id}, active_user_count=1)
+
+def activation_changed(db: Session, user: User, is_active: bool):
+    """
+    Moves the user between the active and inactive counters of every
+    school they belong to.
+    """
+    school_ids = [
+        school_id for (school_id,) in
+        db.query(Branch.school_id)
+        .join(UserRoleAssignment, UserRoleAssignment.branch_id == Branch.id)
+        .filter(UserRoleAssignment.user_id == user.id)
+        .distinct()
+    ]
+    delta = 1 if is_active else -1
+    for school_id in school_ids:
+        _bump(db, SchoolStats, {"school_id": school_id}, active_user_count=delta, inactive_user_count=-delta)
+
+
+# --- Reads ---
+
+def get_school_stats(db: Session, school_id: int) -> Optional[schemas.SchoolStats]:
+    summary = db.get(SchoolStats, school_id)
+    if summary is None:
+        return None
+    roles = db.query(SchoolRoleStats).filter(SchoolRoleStats.school_id == school_id).order_by(SchoolRoleStats.role_id)
+    branches = db.query(BranchStats).filter(BranchStats.school_id == school_id).order_by(BranchStats.branch_id)
+    return schemas.SchoolStats(
+        school_id=school_id,
+        branch_count=summary.branch_count,
+        active_users=summary.active_user_count,
+        inactive_users=summary.inactive_user_count,
+        users_per_role=[schemas.RoleUserCount(role_id=r.role_id, user_count=r.user_count) for r in roles],
+        users_per_branch=[schemas.BranchUserCount(branch_id=b.branch_id, user_count=b.user_count) for b in branches],
+    )
+
+
+# --- Reconciliation ---
+
+def reconcile(db: Session, school_id: Optional[int] = None):
+    """
+    Recomputes the summary rows from the source tables (for one school or
+    all of them) and commits.
+    """
+    schools = db.query(School.id)
+    if school_id is not None:
+        schools = schools.filter(School.id == school_id)
+    school_ids = [sid for (sid,) in schools]
+    if not school_ids:
+        return
+
+    # Delete first, so the read and the replace are one write transaction:
+    # on SQLite the first DELETE takes the database write lock, and no other
+    # write can commit until ours does. A concurrent write either committed
+    # before (and is counted by the aggregates below) or waits and then
+    # bumps the rebuilt rows; none of its increments is overwritten.
+    db.query(SchoolRoleStats).filter(SchoolRoleStats.school_id.in_(school_ids)).delete(synchronize_session="fetch")
+    db.query(BranchStats).filter(BranchStats.school_id.in_(school_ids)).delete(synchronize_session="fetch")
+    db.query(SchoolStats).filter(SchoolStats.school_id.in_(school_ids)).delete(synchronize_session="fetch")
+
+    branch_counts = dict(
+        db.query(Branch.school_id, func.count(Branch.id))
+        .filter(Branch.school_id.in_(school_ids))
+        .group_by(Branch.school_id)
+    )
+    branch_users = dict(
+        db.query(Branch.id, func.count(func.distinct(UserRoleAssignment.user_id)))
+        .outerjoin(UserRoleAssignment, UserRoleAssignment.branch_id == Branch.id)
+        .filter(Branch.school_id.in_(school_ids))
+        .group_by(Branch.id)
+    )
+    branch_schools = dict(db.query(Branch.id, Branch.school_id).filter(Branch.school_id.in_(school_ids)))
+    role_users = (
+        db.query(Branch.school_id, UserRoleAssignment.role_id, func.count(func.distinct(UserRoleAssignment.user_id)))
+        .join(Branch, Branch.id == UserRoleAssignment.branch_id)
+        .filter(Branch.school_id.in_(school_ids))
+        .group_by(Branch.school_id, UserRoleAssignment.role_id)
+        .all()
+    )
+    # NULL counts as active, matching the column default
+    is_inactive = User.is_active == False  # noqa: E712
+    activity = {}
+    for sid, inactive, count in (
+        db.query(Branch.school_id, is_inactive, func.count(func.distinct(User.id)))
+        .join(UserRoleAssignment, UserRoleAssignment.branch_id == Branch.id)
+        .join(User, User.id == UserRoleAssignment.user_id)
+        .filter(Branch.school_id.in_(school_ids))
+        .group_by(Branch.school_id, is_inactive)
+    ):
+        key = (sid, bool(inactive))
+        activity[key] = activity.get(key, 0) + count
+
+    db.add_all(
+        SchoolStats(
+            school_id=sid,
+            branch_count=branch_counts.get(sid, 0),
+            active_user_count=activity.get((sid, False), 0),
+            inactive_user_count=activity.get((sid, True), 0),
+        )
+        for sid in school_ids
+    )
+    db.add_all(
+        BranchStats(branch_id=bid, school_id=branch_schools[bid], user_count=count)
+        for bid, count in branch_users.items()
+    )
+    db.add_all(
+        SchoolRoleStats(school_id=sid, role_id=role_id, user_count=count)
+        for sid, role_id, count in role_users
+    )
+    db.commit()
+
+
+class Reconciler:
+    """
+    Background thread that reconciles all schools at start-up and then
+    every `interval` seconds.
+    """
+    def __init__(self, session_factory: Callable[[], Session], interval: float):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stats-reconciler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.session_factory() as db:
+                    reconcile(db)
+            except Exception:
+                logger.exception("School statistics reconciliation failed")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
@@ -1,14 +1,146 @@
+"""
+Application entry point.
+
+`create_app(settings)` builds the API. Routers - and with them SQLAlchemy,
+passlib and jose - are imported inside the factory rather than when this
+module is loaded, and the lifespan hook does the expensive first-use work
+(opening database connections, loading the bcrypt backend, building the
+reference snapshot and the OpenAPI/response schemas) before the first
+request is accepted. Every import and start-up step is timed; the report
+is logged and served by GET /health.
+
+Run with `uvicorn main:create_app --factory`. `uvicorn main:app` keeps
+working: `app` is built from the environment on first access.
+"""
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
-from core.api import users, auth, schools, roles
 
-app = FastAPI(title="Multi-School AI Education Platform")
+from core.config import Settings, settings as default_settings
+from core.startup import StartupProfiler
+
+# Included in this order
+ROUTERS = [
+    "core.api.auth",
+    "core.api.users",
+    "core.api.schools",
+    "core.api.roles",
+    "core.api.jobs",
+    "core.api.events",
+    "core.api.audit",
+]
+
+
+def _apply_settings(settings: Settings):
+    """
+    Reconfigures the process-wide singletons, which are built from the
+    environment when their modules are imported.
+    """
+    from core import audit, database, events, idempotency, jobs, reference, security
+
+    database.configure(settings.database_url)
+    security.pwd_context.update(bcrypt__rounds=settings.bcrypt_rounds)
+    reference.max_age = settings.reference_max_age
+    jobs.runner.max_workers = settings.job_workers
+    jobs.runner.retry_delay = settings.job_retry_delay
+    jobs.runner.lease = settings.job_lease
+    idempotency.store.ttl = settings.idempotency_ttl
+    idempotency.store.max_entries = settings.idempotency_max_entries
+    events.log.resize(settings.event_log_capacity)
+    events.log.subscriber_buffer = settings.event_subscriber_buffer
+    if audit.log.sink.url != settings.audit_sink_url:
+        audit.log.sink = audit.create_sink(
+            settings.audit_sink_url, max_bytes=settings.audit_file_max_bytes, backups=settings.audit_file_backups
+        )
+    elif isinstance(audit.log.sink, audit.FileSink):
+        audit.log.sink.max_bytes = settings.audit_file_max_bytes
+        audit.log.sink.backups = settings.audit_file_backups
+    audit.log.queue.maxsize = settings.audit_queue_capacity
+    audit.log.batch_size = settings.audit_batch_size
+    audit.log.flush_interval = settings.audit_flush_interval
+    audit.log.put_timeout = settings.audit_put_timeout
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from core import audit, database, events, invalidation, jobs, reference, security, stats
+
+    settings: Settings = app.state.settings
+    profiler: StartupProfiler = app.state.profiler
+
+    with profiler.measure("invalidation bus"):
+        invalidation.configure(settings.invalidation_bus_url, poll_interval=settings.invalidation_poll_interval)
+    with profiler.measure("reference snapshot"):
+        with database.SessionLocal() as db:
+            reference.load(db)
+    with profiler.measure("change feed"):
+        events.log.sync()
+    with profiler.measure("connection pool"):
+        database.warm_pool(settings.warm_connections)
+    with profiler.measure("password hashing"):
+        # Loads the bcrypt backend, which passlib does lazily on first use
+        security.pwd_context.dummy_verify()
+    with profiler.measure("response schemas"):
+        app.openapi()
+
+    reconciler = stats.Reconciler(database.SessionLocal, interval=settings.stats_reconcile_interval)
+    with profiler.measure("background workers"):
+        if settings.stats_reconcile_interval > 0:
+            reconciler.start()
+        jobs.runner.start()
+        audit.log.start()
+
+    app.state.startup_report = profiler.report()
+    profiler.log()
+    try:
+        yield
+    finally:
+        reconciler.stop()
+        jobs.runner.stop()
+        # Writes everything still queued before the process exits
+        audit.log.stop()
+        invalidation.close()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    settings = settings or default_settings
+    profiler = StartupProfiler()
+
+    routers = [profiler.import_module(name).router for name in ROUTERS]
+    with profiler.measure("configure"):
+        from core.idempotency import IdempotencyMiddleware
+        _apply_settings(settings)
+
+    app = FastAPI(title="Multi-School AI Education Platform", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.profiler = profiler
+    app.state.startup_report = None
+    app.add_middleware(IdempotencyMiddleware, wait_timeout=settings.idempotency_wait_timeout)
+
+    # Include the API routers
+    for router in routers:
+        app.include_router(router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Welcome to the Education Platform API. Visit /docs for documentation."}
+
+    @app.get("/health")
+    def health():
+        """
+        Liveness check, with the start-up profile of this worker.
+        """
+        return {"status": "ok", "startup": app.state.startup_report}
+
+    return app
 
-# Include the API routers
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(schools.router)
-app.include_router(roles.router)
 
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the Education Platform API. Visit /docs for documentation."}
+def __getattr__(name: str):
+    # `main.app` is built lazily, so importing this module (or running
+    # with --factory) does not pay for the default app.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -14,6 +14,11 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Migrate the database the app uses (DATABASE_URL), not the placeholder in
+# alembic.ini; "%" is escaped for the ini-style interpolation.
+from core.config import settings
+config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 from core.models import Base
@@ -0,0 +1,55 @@
+"""Add school statistics tables
+
+Revision ID: 3f6c2a9d8e41
+Revises: bd05af4f4227
+Create Date: 2026-10-19 10:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c2a9d8e41'
+down_revision: Union[str, Sequence[str], None] = 'bd05af4f4227'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('school_stats',
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('branch_count', sa.Integer(), nullable=False),
+    sa.Column('active_user_count', sa.Integer(), nullable=False, comment='Active users with at least one role assignment in the school'),
+    sa.Column('inactive_user_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('school_id')
+    )
+    op.create_table('school_role_stats',
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('role_id', sa.Integer(), nullable=False),
+    sa.Column('user_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('school_id', 'role_id')
+    )
+    op.create_table('branch_stats',
+    sa.Column('branch_id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('user_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['branch_id'], ['branches.id'], ),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ),
+    sa.PrimaryKeyConstraint('branch_id')
+    )
+    op.create_index(op.f('ix_branch_stats_school_id'), 'branch_stats', ['school_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_branch_stats_school_id'), table_name='branch_stats')
+    op.drop_table('branch_stats')
+    op.drop_table('school_role_stats')
+    op.drop_table('school_stats')
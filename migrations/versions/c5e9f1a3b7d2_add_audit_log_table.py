@@ -0,0 +1,43 @@
+"""Add audit log table
+
+Revision ID: c5e9f1a3b7d2
+Revises: 8a1d4e7b2c90
+Create Date: 2026-10-19 15:42:08.913274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9f1a3b7d2'
+down_revision: Union[str, Sequence[str], None] = '8a1d4e7b2c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('audit_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=True, comment='User who made the change; NULL for anonymous calls'),
+    sa.Column('action', sa.String(), nullable=False, comment="e.g. 'school.created', 'role.assigned'"),
+    sa.Column('entity_type', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.String(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_audit_log_actor_id'), 'audit_log', ['actor_id'], unique=False)
+    op.create_index(op.f('ix_audit_log_id'), 'audit_log', ['id'], unique=False)
+    op.create_index(op.f('ix_audit_log_occurred_at'), 'audit_log', ['occurred_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_audit_log_occurred_at'), table_name='audit_log')
+    op.drop_index(op.f('ix_audit_log_id'), table_name='audit_log')
+    op.drop_index(op.f('ix_audit_log_actor_id'), table_name='audit_log')
+    op.drop_table('audit_log')
@@ -0,0 +1,37 @@
+"""Add change events table
+
+Revision ID: e2b8d4f6a1c3
+Revises: c5e9f1a3b7d2
+Create Date: 2026-10-19 17:26:51.402836
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8d4f6a1c3'
+down_revision: Union[str, Sequence[str], None] = 'c5e9f1a3b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('change_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False, comment="e.g. 'school.created', 'role.assigned'"),
+    sa.Column('school_id', sa.Integer(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_change_events_id'), 'change_events', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_change_events_id'), table_name='change_events')
+    op.drop_table('change_events')
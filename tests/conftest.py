@@ -1,22 +1,51 @@
+"""
+Test setup.
+
+- Passwords are hashed with the minimum bcrypt work factor (BCRYPT_ROUNDS),
+  which must be set before the app (and `core.config`) is imported.
+- Every test runs inside a transaction on its own connection that is rolled
+  back afterwards; the sessions used by the app join it through SAVEPOINTs,
+  so their commits never leak into the next test.
+- Each pytest-xdist worker (`pytest -n auto`) is its own process with its own
+  database file, so workers never share state.
+"""
+import os
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 
 from main import app
+from core import audit, events, family, idempotency, jobs, reference
 from core.database import get_db
 from core.models import Base
 
 # --- Test Database Setup ---
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+def create_test_engine(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    # pysqlite's own transaction handling breaks SAVEPOINTs; let SQLAlchemy
+    # emit BEGIN itself.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    return engine
+
+# Bound to each test's connection by the `connection` fixture
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, join_transaction_mode="create_savepoint"
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 # --- Dependency Override ---
@@ -30,12 +59,91 @@ def override_get_db():
 # Apply the override to the FastAPI app
 app.dependency_overrides[get_db] = override_get_db
 
+# Background jobs use the test database and run inline, inside the test's
+# transaction (the threaded runner is tested on its own database in test_jobs)
+jobs.runner.session_factory = TestingSessionLocal
+jobs.runner.eager = True
 
-# --- Pytest Fixture for Test Client ---
+# The change feed syncs from the test database
+events.log.session_factory = TestingSessionLocal
+
+# Audit entries go to the test database; tests call `audit.log.flush()`
+# themselves instead of waiting for the flusher thread
+audit.log.sink = audit.DatabaseSink(TestingSessionLocal)
+
+
+# --- Database Fixtures ---
 @pytest.fixture(scope="session")
-def client():
-    # Create tables before running tests
+def database():
+    # A throwaway file per test process (one per xdist worker), with the
+    # tables created once
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    directory = tempfile.mkdtemp(prefix=f"edu-test-{worker_id}-")
+    engine = create_test_engine(os.path.join(directory, "test.db"))
     Base.metadata.create_all(bind=engine)
-    yield TestClient(app)
-    # Drop tables after tests are done
-    Base.metadata.drop_all(bind=engine)
+    yield engine
+    engine.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture
+def connection(database):
+    connection = database.connect()
+    transaction = connection.begin()
+    TestingSessionLocal.configure(bind=connection)
+    yield connection
+    transaction.rollback()
+    connection.close()
+    # In-process caches may hold rows that were just rolled back
+    reference.reset()
+    family.clear()
+    idempotency.store.clear()
+    events.log.clear()
+    audit.log.clear()
+
+@pytest.fixture
+def session_factory(connection):
+    """
+    Sessions on the test's connection, for code that opens its own.
+    """
+    return TestingSessionLocal
+
+@pytest.fixture
+def db(connection):
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# --- Pytest Fixture for Test Client ---
+@pytest.fixture
+def client(connection):
+    return TestClient(app)
+
+
+# --- User Fixtures ---
+@pytest.fixture
+def make_user(client):
+    """
+    Signs up a user through the API and returns their id.
+    """
+    def make_user(email: str, password: str = "password123") -> int:
+        response = client.post("/users/", json={"email": email, "password": password})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+    return make_user
+
+@pytest.fixture
+def auth_headers(client, make_user):
+    """
+    Returns the Authorization header of a user, signing them up first if
+    they cannot log in yet.
+    """
+    def auth_headers(email: str, password: str = "password123") -> dict:
+        response = client.post("/token", data={"username": email, "password": password})
+        if response.status_code == 401:
+            make_user(email, password)
+            response = client.post("/token", data={"username": email, "password": password})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return auth_headers
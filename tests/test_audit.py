@@ -0,0 +1,166 @@
+import json
+import threading
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from core import audit, jobs
+from core.audit import AuditLog, FileSink
+from core.security import create_access_token
+
+class ListSink:
+    url = "list://"
+
+    def __init__(self, fail: int = 0):
+        self.batches = []
+        self.fail = fail
+
+    def write(self, entries):
+        if self.fail:
+            self.fail -= 1
+            raise OSError("sink unavailable")
+        self.batches.append(list(entries))
+
+    def close(self):
+        pass
+
+def test_writes_are_attributed_to_the_current_user(client: TestClient, auth_headers):
+    """
+    Test that writes are audited with the authenticated user as actor, once flushed.
+    """
+    headers = auth_headers("auditor@example.com")
+    me = client.get("/users/me", headers=headers).json()
+    school_id = client.post("/schools/", json={"name": "Audited School"}, headers=headers).json()["id"]
+    branch_id = client.post(f"/schools/{school_id}/branches/", json={"name": "Audited Branch"}).json()["id"]
+    role_id = client.post("/roles/", json={"name": "Audited Role"}, headers=headers).json()["id"]
+    client.post("/roles/assign", json={"user_id": me["id"], "role_id": role_id, "branch_id": branch_id}, headers=headers)
+
+    # Nothing is written until the queue is flushed
+    assert client.get("/audit/", headers=headers).json() == []
+    assert audit.log.flush() == 5
+
+    entries = client.get("/audit/", headers=headers).json()
+    assert [(e["action"], e["actor_id"]) for e in reversed(entries)] == [
+        ("user.created", None),
+        ("school.created", me["id"]),
+        ("branch.created", None),
+        ("role.created", me["id"]),
+        ("role.assigned", me["id"]),
+    ]
+    assert "password" not in entries[-1]["data"]
+    mine = client.get("/audit/", params={"actor_id": me["id"]}, headers=headers).json()
+    assert {e["action"] for e in mine} == {"school.created", "role.created", "role.assigned"}
+
+def test_invalid_tokens_are_anonymous_on_public_endpoints(client: TestClient, auth_headers):
+    """
+    Test that a malformed or expired token on a public endpoint is treated as
+    no token at all, rather than rejected.
+    """
+    expired = create_access_token({"sub": "nobody@example.com"}, expires_delta=timedelta(minutes=-1))
+    for token in ("garbage", expired):
+        headers = {"Authorization": f"Bearer {token}"}
+        user = client.post("/users/", json={"email": f"anon-{len(token)}@example.com", "password": "password123"},
+                           headers=headers)
+        assert user.status_code == 201
+        school = client.post("/schools/", json={"name": f"Anonymous School {len(token)}"}, headers=headers)
+        assert school.status_code == 201
+        assert client.post(f"/schools/{school.json()['id']}/branches/", json={"name": "Anonymous Branch"},
+                           headers=headers).status_code == 201
+
+    audit.log.flush()
+    headers = auth_headers("anon-auditor@example.com")
+    assert {e["actor_id"] for e in client.get("/audit/", headers=headers).json()} == {None}
+
+def test_job_writes_are_attributed_to_the_submitter(client: TestClient, auth_headers):
+    """
+    Test that writes made by a background job are audited as the submitting user.
+    """
+    headers = auth_headers("audited_owner@example.com")
+    owner_id = client.get("/users/me", headers=headers).json()["id"]
+    job = client.post("/jobs/provision-school", json={"name": "Audited Academy", "roles": []}, headers=headers).json()
+    assert jobs.runner.wait(job["id"]) == "succeeded"
+    audit.log.flush()
+
+    entries = client.get("/audit/", params={"actor_id": owner_id}, headers=headers).json()
+    assert {e["action"] for e in entries} == {"school.created", "branch.created"}
+
+def test_metrics_report_queue_depth_and_flush_latency(client: TestClient, auth_headers):
+    """
+    Test that the metrics endpoint reports the queue and the last flush.
+    """
+    headers = auth_headers("metrics@example.com")
+    assert client.get("/audit/metrics", headers=headers).json()["queue_depth"] == 1
+    audit.log.flush()
+    metrics = client.get("/audit/metrics", headers=headers).json()
+    assert metrics["queue_depth"] == 0
+    assert metrics["last_flush_seconds"] is not None
+
+def test_full_queue_drops_and_counts_entries():
+    """
+    Test that a full queue makes writers wait at most put_timeout, then drops.
+    """
+    log = AuditLog(ListSink(), capacity=2, put_timeout=0.01)
+    for i in range(3):
+        log.record("school.created", "school", i)
+    assert log.metrics()["queue_depth"] == 2
+    assert log.metrics()["dropped"] == 1
+    assert log.flush() == 2
+
+def test_failed_batch_is_retried():
+    """
+    Test that a batch rejected by the sink is kept and written on the next flush.
+    """
+    sink = ListSink(fail=1)
+    log = AuditLog(sink, batch_size=2)
+    for i in range(3):
+        log.record("school.created", "school", i)
+    assert log.flush() == 0
+    assert log.metrics()["failed_flushes"] == 1
+    assert log.metrics()["queue_depth"] == 3
+    assert log.flush() == 3
+    assert [[e.entity_id for e in batch] for batch in sink.batches] == [["0", "1"], ["2"]]
+
+def test_stop_drains_the_queue():
+    """
+    Test that stopping the flusher writes everything still queued.
+    """
+    sink = ListSink()
+    log = AuditLog(sink, flush_interval=60)
+    log.start()
+    log.record("school.created", "school", 1)
+    log.stop()
+    assert [e.entity_id for batch in sink.batches for e in batch] == ["1"]
+
+def test_batch_size_wakes_the_flusher():
+    """
+    Test that a full batch is flushed without waiting for the interval.
+    """
+    flushed = threading.Event()
+    sink = ListSink()
+    log = AuditLog(sink, batch_size=2, flush_interval=60)
+    original = sink.write
+    sink.write = lambda entries: (original(entries), flushed.set())
+    log.start()
+    log.record("school.created", "school", 1)
+    log.record("school.created", "school", 2)
+    assert flushed.wait(5)
+    log.stop()
+    assert len(sink.batches) == 1
+
+def test_file_sink_writes_ndjson_and_rotates(tmp_path):
+    """
+    Test that the file sink appends one JSON object per line and rotates by size.
+    """
+    path = tmp_path / "audit.ndjson"
+    sink = FileSink(str(path), max_bytes=1, backups=1)
+    log = AuditLog(sink)
+    for batch in range(3):
+        log.record("school.created", "school", batch, actor_id=7, data={"name": f"School {batch}"})
+        log.flush()
+    sink.close()
+
+    current = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(e["entity_id"], e["actor_id"], e["data"]["name"]) for e in current] == [("2", 7, "School 2")]
+    assert json.loads((tmp_path / "audit.ndjson.1").read_text())["entity_id"] == "1"
+    # Only `backups` old files are kept
+    assert not (tmp_path / "audit.ndjson.2").exists()
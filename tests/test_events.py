@@ -0,0 +1,145 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+
+from core import events, invalidation
+from core.api.events import event_stream
+from core.events import EventLog
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return True
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_writes_are_appended_to_the_log(client: TestClient):
+    """
+    Test that creating a school and a branch appends change events.
+    """
+    school_id = client.post("/schools/", json={"name": "Feed School"}).json()["id"]
+    branch_id = client.post(f"/schools/{school_id}/branches/", json={"name": "Feed Branch"}).json()["id"]
+
+    school_created, branch_created = events.log.recent()[-2:]
+    assert (school_created.type, school_created.school_id) == ("school.created", school_id)
+    assert branch_created.type == "branch.created"
+    assert branch_created.data == {"id": branch_id, "name": "Feed Branch", "school_id": school_id}
+
+def test_every_worker_sees_the_same_events(client: TestClient):
+    """
+    Test that another worker's log syncs the same events, with the same ids,
+    from the shared table.
+    """
+    school_id = client.post("/schools/", json={"name": "Shared Feed School"}).json()["id"]
+    client.post(f"/schools/{school_id}/branches/", json={"name": "Shared Feed Branch"})
+    here = [(e.id, e.type) for e in events.log.recent()]
+
+    other_worker = EventLog(session_factory=events.log.session_factory)
+    other_worker.sync()
+    assert [(e.id, e.type) for e in other_worker.recent()] == here
+
+    async def resume():
+        subscription, backlog, complete = other_worker.subscribe(last_event_id=here[0][0])
+        other_worker.unsubscribe(subscription)
+        return backlog, complete
+
+    backlog, complete = run(resume())
+    assert complete
+    assert [(e.id, e.type) for e in backlog] == here[1:]
+
+def test_remote_writes_reach_the_log(client: TestClient, db):
+    """
+    Test that a notification from another worker syncs the events it committed.
+    """
+    events.log.sync()
+    # Committed by another worker, which then notifies over the bus
+    events.log.record(db, "school.created", 42, {"id": 42, "name": "Remote School"})
+    db.commit()
+    assert events.log.recent(school_id=42) == []
+
+    invalidation.deliver(invalidation.InvalidationEvent("events", None, 1, f"other-worker-{uuid.uuid4()}"))
+    (event,) = events.log.recent(school_id=42)
+    assert event.data == {"id": 42, "name": "Remote School"}
+
+def test_stream_requires_authentication(client: TestClient):
+    """
+    Test that the change feed rejects anonymous clients.
+    """
+    assert client.get("/events/stream").status_code == 401
+
+def test_resume_from_last_event_id():
+    """
+    Test that a subscriber gets the retained events after its last id, filtered by school.
+    """
+    log = EventLog(capacity=10)
+    for school_id in (1, 2, 1):
+        log.append("school.created", school_id, {"id": school_id})
+
+    async def subscribe():
+        subscription, backlog, complete = log.subscribe(school_id=1, last_event_id=1)
+        log.unsubscribe(subscription)
+        return backlog, complete
+
+    backlog, complete = run(subscribe())
+    assert [e.id for e in backlog] == [3]
+    assert complete
+
+def test_resume_after_events_were_dropped():
+    """
+    Test that resuming from an id older than the retained tail asks for a reset.
+    """
+    log = EventLog(capacity=2)
+    for i in range(5):
+        log.append("school.created", i, {})
+
+    async def stream():
+        subscription, backlog, complete = log.subscribe(last_event_id=1)
+        chunks = []
+        async for chunk in event_stream(FakeRequest(), subscription, backlog, complete):
+            chunks.append(chunk)
+            if len(chunks) == 4:
+                break
+        return chunks
+
+    chunks = run(stream())
+    assert chunks[1].startswith("id: 5\nevent: reset")
+    assert chunks[2].startswith("id: 4\nevent: school.created\n")
+    assert chunks[3].startswith("id: 5\n")
+
+def test_live_events_are_streamed():
+    """
+    Test that events appended after subscribing reach the stream, from any thread.
+    """
+    log = EventLog()
+
+    async def stream():
+        subscription, backlog, complete = log.subscribe(school_id=7)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, log.append, "branch.created", 8, {"id": 1})
+        await loop.run_in_executor(None, log.append, "branch.created", 7, {"id": 2})
+        event = await subscription.get(timeout=1)
+        log.unsubscribe(subscription)
+        return event
+
+    event = run(stream())
+    assert event.school_id == 7
+    assert event.data == {"id": 2}
+
+def test_slow_subscriber_is_disconnected():
+    """
+    Test that a full per-client buffer ends the subscription instead of growing.
+    """
+    log = EventLog(subscriber_buffer=2)
+
+    async def overflow():
+        subscription, _, _ = log.subscribe()
+        for i in range(5):
+            log.append("school.created", i, {})
+        await asyncio.sleep(0)
+        return subscription, await subscription.get(timeout=1)
+
+    subscription, event = run(overflow())
+    assert event is None
+    assert subscription.overflowed
+    assert subscription not in log._subscribers
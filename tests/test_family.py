@@ -0,0 +1,95 @@
+from fastapi.testclient import TestClient
+
+from core import crud
+
+def test_family_graph(client: TestClient, make_user, auth_headers):
+    """
+    Test that children, siblings and co-parents are resolved across the whole family.
+    """
+    mum = make_user("family_mum@example.com")
+    dad = make_user("family_dad@example.com")
+    anna = make_user("family_anna@example.com")
+    ben = make_user("family_ben@example.com")
+    headers = auth_headers("family_mum@example.com")
+    dad_headers = auth_headers("family_dad@example.com")
+
+    for parent, child, parent_headers in [(mum, anna, headers), (mum, ben, headers), (dad, anna, dad_headers)]:
+        response = client.post(f"/users/{parent}/children/{child}", headers=parent_headers)
+        assert response.status_code == 204
+
+    graph = client.get("/users/me/family", headers=headers).json()
+    assert graph["user_id"] == mum
+    assert graph["children"] == [anna, ben]
+    assert graph["co_parents"] == [dad]
+    assert graph["parents"] == []
+    assert sorted(m["id"] for m in graph["members"]) == sorted([mum, dad, anna, ben])
+
+    graph = client.get(f"/users/{ben}/family", headers=headers).json()
+    assert graph["parents"] == [mum]
+    assert graph["siblings"] == [anna]
+
+def test_family_graph_is_cached_and_evicted(client: TestClient, monkeypatch, make_user, auth_headers):
+    """
+    Test that a cached family is reused and dropped when a link or assignment changes.
+    """
+    parent = make_user("cache_parent@example.com")
+    child = make_user("cache_child@example.com")
+    headers = auth_headers("cache_parent@example.com")
+    client.post(f"/users/{parent}/children/{child}", headers=headers)
+    client.get("/users/me/family", headers=headers)
+
+    calls = []
+    original = crud.get_family_links
+    monkeypatch.setattr(crud, "get_family_links", lambda db, user_id: calls.append(user_id) or original(db, user_id))
+
+    # Served from the cache, including for another member of the family
+    assert client.get(f"/users/{child}/family", headers=headers).json()["parents"] == [parent]
+    assert calls == []
+
+    # A role assignment on a member changes the cached profile data
+    school_id = client.post("/schools/", json={"name": "Family School"}).json()["id"]
+    branch_id = client.post(f"/schools/{school_id}/branches/", json={"name": "Main"}).json()["id"]
+    role_id = client.post("/roles/", json={"name": "Student"}, headers=headers).json()["id"]
+    client.post("/roles/assign", json={"user_id": child, "role_id": role_id, "branch_id": branch_id}, headers=headers)
+    graph = client.get("/users/me/family", headers=headers).json()
+    assert calls == [parent]
+    member = next(m for m in graph["members"] if m["id"] == child)
+    assert member["role_assignments"][0]["role"]["name"] == "Student"
+    assert member["role_assignments"][0]["branch"]["name"] == "Main"
+
+    # Unlinking splits the family again
+    response = client.delete(f"/users/{parent}/children/{child}", headers=headers)
+    assert response.status_code == 204
+    assert client.get("/users/me/family", headers=headers).json()["children"] == []
+
+def test_link_validation(client: TestClient, make_user, auth_headers):
+    """
+    Test that invalid links are rejected.
+    """
+    user = make_user("self_parent@example.com")
+    headers = auth_headers("self_parent@example.com")
+    assert client.post(f"/users/{user}/children/{user}", headers=headers).status_code == 400
+    assert client.post(f"/users/{user}/children/999999", headers=headers).status_code == 404
+    assert client.delete(f"/users/{user}/children/999999", headers=headers).status_code == 404
+    assert client.get("/users/999999/family", headers=headers).status_code == 403
+
+def test_only_parents_change_links_and_only_family_reads_graphs(client: TestClient, make_user, auth_headers):
+    """
+    Test that users cannot link or unlink other users' children, nor read the
+    family of someone outside their own.
+    """
+    parent = make_user("guarded_parent@example.com")
+    child = make_user("guarded_child@example.com")
+    parent_headers = auth_headers("guarded_parent@example.com")
+    client.post(f"/users/{parent}/children/{child}", headers=parent_headers)
+    stranger = make_user("stranger@example.com")
+    headers = auth_headers("stranger@example.com")
+
+    assert client.post(f"/users/{parent}/children/{stranger}", headers=headers).status_code == 403
+    assert client.delete(f"/users/{parent}/children/{child}", headers=headers).status_code == 403
+    assert client.get(f"/users/{child}/family", headers=headers).status_code == 403
+    assert client.get(f"/users/{parent}/family", headers=headers).status_code == 403
+
+    # Members of the family can still read each other's view
+    child_headers = auth_headers("guarded_child@example.com")
+    assert client.get(f"/users/{parent}/family", headers=child_headers).json()["children"] == [child]
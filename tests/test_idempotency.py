@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+from core import crud, idempotency
+from core.idempotency import IdempotencyStore, StoredResponse, StoreFullError
+
+def test_retry_replays_stored_response(client: TestClient, monkeypatch):
+    """
+    Test that a retried POST with the same key is answered from the store.
+    """
+    calls = []
+    original = crud.create_user
+    monkeypatch.setattr(crud, "create_user", lambda db, user, **kwargs: calls.append(user) or original(db, user, **kwargs))
+    payload = {"email": "idempotent@example.com", "password": "password123"}
+    headers = {"Idempotency-Key": "create-idempotent-user"}
+
+    first = client.post("/users/", json=payload, headers=headers)
+    retry = client.post("/users/", json=payload, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert len(calls) == 1
+
+def test_key_reuse_with_different_payload(client: TestClient):
+    """
+    Test that a key cannot be reused for a different request body.
+    """
+    headers = {"Idempotency-Key": "school-key"}
+    assert client.post("/schools/", json={"name": "Idempotent School"}, headers=headers).status_code == 201
+    response = client.post("/schools/", json={"name": "Another School"}, headers=headers)
+    assert response.status_code == 422
+
+def test_concurrent_duplicates_execute_once(client: TestClient, monkeypatch):
+    """
+    Test that duplicates arriving while the original runs wait for its response.
+    """
+    calls = []
+
+    # Requests run in parallel threads, so keep them off the test's
+    # (single) database connection
+    def slow_create_school(db, school, **kwargs):
+        calls.append(school)
+        time.sleep(0.2)
+        return {"id": 1, "name": school.name, "branches": []}
+
+    monkeypatch.setattr(crud, "create_school", slow_create_school)
+    responses = []
+
+    def post():
+        responses.append(client.post(
+            "/schools/", json={"name": "Concurrent School"}, headers={"Idempotency-Key": "concurrent"}
+        ))
+
+    threads = [threading.Thread(target=post) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [201] * 4
+    assert len({r.json()["id"] for r in responses}) == 1
+
+def test_requests_without_key_are_untouched(client: TestClient):
+    """
+    Test that POSTs without the header run every time.
+    """
+    payload = {"email": "keyless@example.com", "password": "password123"}
+    assert client.post("/users/", json=payload).status_code == 201
+    response = client.post("/users/", json=payload)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Email already registered"}
+
+def test_store_expires_and_bounds_entries():
+    """
+    Test TTL expiry and the entry limit of the store.
+    """
+    store = IdempotencyStore(max_entries=2, ttl=0.05)
+    for key in ("a", "b", "c"):
+        entry, owner = store.begin(key, "fingerprint")
+        assert owner
+        store.complete(key, entry, StoredResponse(201, (), b"{}"))
+    assert len(store) == 2
+    time.sleep(0.06)
+    entry, owner = store.begin("a", "fingerprint")
+    assert owner
+    assert len(store) == 1
+
+def test_running_entries_are_never_evicted():
+    """
+    Test that a full store keeps entries still in progress, so their retries
+    wait rather than execute again, and turns new keys away while it is full.
+    """
+    store = IdempotencyStore(max_entries=2)
+    running, _ = store.begin("running", "fingerprint")
+    done, _ = store.begin("done", "fingerprint")
+    store.complete("done", done, StoredResponse(201, (), b"{}"))
+
+    entry, owner = store.begin("new", "fingerprint")
+    assert owner
+    assert store.begin("running", "fingerprint") == (running, False)
+    with pytest.raises(StoreFullError):
+        store.begin("another", "fingerprint")
+
+def test_full_store_rejects_new_keys(client: TestClient, monkeypatch):
+    """
+    Test that a store full of in-flight requests answers new keys with 503.
+    """
+    monkeypatch.setattr(idempotency.store, "max_entries", 1)
+    idempotency.store.begin("in-flight", "fingerprint")
+    response = client.post("/schools/", json={"name": "Full School"}, headers={"Idempotency-Key": "full"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_waiting_duplicates_do_not_hold_threads():
+    """
+    Test that duplicates wait on the event loop, not in worker threads that
+    sync endpoints need, and wake up when the original completes.
+    """
+    store = IdempotencyStore()
+    entry, owner = store.begin("slow", "fingerprint")
+    assert owner
+
+    async def scenario():
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        waiters = [asyncio.ensure_future(entry.wait(5)) for _ in range(int(limiter.total_tokens) + 10)]
+        await asyncio.sleep(0.05)
+        assert limiter.borrowed_tokens == 0
+        # Completed from another thread, as a sync endpoint would
+        threading.Thread(target=store.abandon, args=("slow", entry)).start()
+        return await asyncio.gather(*waiters)
+
+    assert all(asyncio.run(scenario()))
+
+def test_waiting_duplicate_times_out():
+    """
+    Test that a duplicate gives up once the wait timeout has passed.
+    """
+    entry, _ = IdempotencyStore().begin("stuck", "fingerprint")
+    assert asyncio.run(entry.wait(0.01)) is False
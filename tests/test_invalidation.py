@@ -0,0 +1,218 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from core import invalidation, reference
+from core.invalidation import InvalidationEvent, RedisBackend, SQLiteBackend
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_publish_notifies_local_subscribers():
+    """
+    Test that publish reaches local subscribers unless they are remote-only.
+    """
+    received, remote_received = [], []
+    invalidation.subscribe("test-local", received.append)
+    invalidation.subscribe("test-local", remote_received.append, remote_only=True)
+
+    event = invalidation.publish("test-local", 42)
+
+    assert received == [event]
+    assert event.key == "42"
+    assert remote_received == []
+
+
+def test_deliver_drops_own_and_replayed_events():
+    """
+    Test that remote events are applied once per version and own events are ignored.
+    """
+    received = []
+    invalidation.subscribe("test-remote", received.append, remote_only=True)
+    remote = InvalidationEvent(topic="test-remote", key="1", version=1, origin="other-worker")
+
+    invalidation.deliver(remote)
+    invalidation.deliver(remote)
+    invalidation.deliver(InvalidationEvent("test-remote", "1", 99, invalidation.origin))
+
+    assert received == [remote]
+
+
+class RecordingBackend(invalidation.InMemoryBackend):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, event):
+        self.sent.append(event)
+
+
+def test_concurrent_publishers_send_in_version_order(monkeypatch):
+    """
+    Test that events leave in version order even when a local subscriber is
+    slow, so the receiving worker does not drop the older one as a replay.
+    """
+    backend = RecordingBackend()
+    monkeypatch.setattr(invalidation, "_backend", backend)
+    invalidation.subscribe("test-slow", lambda event: time.sleep(0.1))
+    slow = threading.Thread(target=invalidation.publish, args=("test-slow",))
+    slow.start()
+    time.sleep(0.02)
+    publishers = [threading.Thread(target=invalidation.publish, args=("test-fast", i)) for i in range(8)]
+    for thread in publishers:
+        thread.start()
+    for thread in publishers + [slow]:
+        thread.join()
+
+    versions = [event.version for event in backend.sent]
+    assert versions == sorted(versions)
+
+    received = []
+    invalidation.subscribe("test-slow", received.append, remote_only=True)
+    invalidation.subscribe("test-fast", received.append, remote_only=True)
+    for event in backend.sent:
+        invalidation.deliver(InvalidationEvent(event.topic, event.key, event.version, "ordered-worker"))
+    assert len(received) == 9
+
+
+def test_remote_reference_event_drops_snapshot(client):
+    """
+    Test that a reference write in another worker drops this worker's snapshot.
+    """
+    client.get("/schools/")
+    assert reference._snapshot is not None
+
+    invalidation.deliver(InvalidationEvent("reference", "school:1", 1, "reference-worker"))
+
+    assert reference._snapshot is None
+
+
+def test_sqlite_backend_fans_out_between_workers(tmp_path):
+    """
+    Test that two SQLite backends on the same file see each other's events.
+    """
+    path = str(tmp_path / "bus.db")
+    worker_a, worker_b = SQLiteBackend(path, poll_interval=0.01), SQLiteBackend(path, poll_interval=0.01)
+    received_a, received_b = [], []
+    worker_a.start(received_a.append)
+    worker_b.start(received_b.append)
+    try:
+        event = InvalidationEvent(topic="user", key="7", version=1, origin="worker-a")
+        worker_a.send(event)
+        assert wait_for(lambda: received_b == [event])
+        assert received_a == [event]
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+class _StandInRedis(socketserver.ThreadingTCPServer):
+    """A tiny server implementing just SUBSCRIBE and PUBLISH of the Redis protocol."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.subscribers = []
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = RedisBackend._read(self.rfile)
+            except ConnectionError:
+                return
+            if command[0] == "SUBSCRIBE":
+                self.server.subscribers.append((command[1], self.wfile))
+                # Reply: ["subscribe", <channel>, 1]
+                self.wfile.write(b"*3\r\n$9\r\nsubscribe\r\n" + RedisBackend._encode(command[1])[4:] + b":1\r\n")
+            elif command[0] == "PUBLISH":
+                targets = [w for channel, w in self.server.subscribers if channel == command[1]]
+                for w in targets:
+                    w.write(RedisBackend._encode("message", command[1], command[2]))
+                self.wfile.write(b":%d\r\n" % len(targets))
+
+
+@pytest.fixture
+def redis_stand_in():
+    server = _StandInRedis()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_backend_against_stand_in(redis_stand_in):
+    """
+    Test that the RESP backend publishes and receives through a Redis-protocol server.
+    """
+    host, port = redis_stand_in
+    worker_a = RedisBackend(host=host, port=port, channel="bus")
+    worker_b = RedisBackend(host=host, port=port, channel="bus")
+    received_b = []
+    worker_a.start(lambda event: None)
+    worker_b.start(received_b.append)
+    try:
+        event = InvalidationEvent(topic="role", key="3", version=5, origin="worker-a")
+        worker_a.send(event)
+        assert wait_for(lambda: received_b == [event])
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_redis_backend_does_not_block_the_sender(redis_stand_in):
+    """
+    Test that a slow connection to the server delays the event, not the write
+    that published it.
+    """
+    host, port = redis_stand_in
+    worker_a = RedisBackend(host=host, port=port, channel="bus")
+    worker_b = RedisBackend(host=host, port=port, channel="bus")
+    received_b = []
+    worker_a.start(lambda event: None)
+    worker_b.start(received_b.append)
+    connect = worker_a._connect
+    worker_a._connect = lambda: (time.sleep(0.5), connect())[1]
+    try:
+        event = InvalidationEvent(topic="user", key="4", version=1, origin="worker-a")
+        start = time.monotonic()
+        worker_a.send(event)
+        assert time.monotonic() - start < 0.1
+        assert wait_for(lambda: received_b == [event])
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_create_backend_rejects_unknown_scheme():
+    """
+    Test that an unsupported bus URL is reported instead of silently ignored.
+    """
+    with pytest.raises(ValueError):
+        invalidation.create_backend("carrier-pigeon://loft")
+
+def test_sqlite_bus_url_follows_sqlalchemy_paths(tmp_path, monkeypatch):
+    """
+    Test that three slashes mean a relative path and four an absolute one.
+    """
+    monkeypatch.chdir(tmp_path)
+    relative = invalidation.create_backend("sqlite:///./bus.db")
+    absolute = invalidation.create_backend(f"sqlite:///{tmp_path}/other.db")
+    try:
+        assert relative.path == "./bus.db"
+        assert absolute.path == f"{tmp_path}/other.db"
+        assert (tmp_path / "bus.db").exists() and (tmp_path / "other.db").exists()
+    finally:
+        relative.close()
+        absolute.close()
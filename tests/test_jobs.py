@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core import jobs
+from core.models import Base
+from core.security import verify_password
+
+def test_provision_school_job(client: TestClient, auth_headers):
+    """
+    Test that a provisioning job creates the school, branches, roles and admins.
+    """
+    headers = auth_headers("jobs_owner@example.com")
+    payload = {
+        "name": "Provisioned Academy",
+        "branches": [{"name": "East"}, {"name": "West"}],
+        "admins": [{"email": "provisioned_admin@example.com", "password": "admin-secret"}],
+    }
+    response = client.post("/jobs/provision-school", json=payload, headers=headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "provision_school"
+
+    assert jobs.runner.wait(job["id"]) == "succeeded"
+    job = client.get(f"/jobs/{job['id']}", headers=headers).json()
+    assert job["progress"] == job["total"] == 8
+    school_id = job["result"]["school_id"]
+
+    school = client.get(f"/schools/{school_id}").json()
+    assert [b["name"] for b in school["branches"]] == ["East", "West"]
+    assert set(job["result"]["role_ids"]) == {"Admin", "Teacher", "Student", "Parent"}
+
+    # The admin can log in and holds the Admin role in both branches
+    admin_headers = auth_headers("provisioned_admin@example.com", "admin-secret")
+    me = client.get("/users/me", headers=admin_headers).json()
+    assert {a["branch_id"] for a in me["role_assignments"]} == set(job["result"]["branch_ids"])
+
+    # Submitting the same school again is rejected up front
+    response = client.post("/jobs/provision-school", json=payload, headers=headers)
+    assert response.status_code == 400
+
+def test_provisioning_never_stores_plain_passwords(client: TestClient, db, monkeypatch, auth_headers):
+    """
+    Test that admin passwords are hashed before the job row is inserted.
+    """
+    # Keep the job queued, as it would be until a worker picks it up
+    monkeypatch.setattr(jobs.runner, "_dispatch", lambda job_id, delay=0: None)
+    headers = auth_headers("jobs_hashing@example.com")
+    payload = {"name": "Hashed Academy", "admins": [{"email": "hashed_admin@example.com", "password": "admin-secret"}]}
+    job = client.post("/jobs/provision-school", json=payload, headers=headers).json()
+
+    stored = db.get(jobs.Job, job["id"])
+    assert stored.status == "queued"
+    assert "admin-secret" not in json.dumps(stored.params)
+    (admin,) = stored.params["admins"]
+    assert verify_password("admin-secret", admin["hashed_password"])
+
+def test_failed_job_is_retried(client: TestClient, db):
+    """
+    Test that a failing job is retried and that secrets are redacted once done.
+    """
+    attempts = []
+
+    @jobs.handler("test_flaky")
+    def flaky(work_db, params, progress):
+        attempts.append(params)
+        if len(attempts) < 2:
+            raise RuntimeError("transient failure")
+        return {"ok": True}
+
+    job = jobs.runner.submit(db, "test_flaky", {"password": "hunter2"}, max_attempts=3)
+    assert jobs.runner.wait(job.id) == "succeeded"
+    db.expire_all()
+    stored = db.get(jobs.Job, job.id)
+    assert stored.attempts == 2
+    assert stored.error is None
+    assert stored.params == {"password": "***"}
+
+def test_job_gives_up_after_max_attempts(client: TestClient, db):
+    """
+    Test that a job that keeps failing ends up failed with the last error.
+    """
+    @jobs.handler("test_broken")
+    def broken(work_db, params, progress):
+        raise ValueError("always broken")
+
+    job = jobs.runner.submit(db, "test_broken", {}, max_attempts=2)
+    assert jobs.runner.wait(job.id) == "failed"
+    db.expire_all()
+    stored = db.get(jobs.Job, job.id)
+    assert stored.attempts == 2
+    assert stored.error == "ValueError: always broken"
+
+def test_job_is_claimed_once(client: TestClient, db, monkeypatch):
+    """
+    Test that a job another worker already claimed is not run again.
+    """
+    runs = []
+
+    @jobs.handler("test_claimed")
+    def claimed(work_db, params, progress):
+        runs.append(params)
+
+    monkeypatch.setattr(jobs.runner, "_dispatch", lambda job_id, delay=0: None)
+    job = jobs.runner.submit(db, "test_claimed", {})
+    # Another worker's claim
+    db.query(jobs.Job).filter(jobs.Job.id == job.id).update({jobs.Job.status: jobs.RUNNING, jobs.Job.attempts: 1})
+    db.commit()
+
+    jobs.runner._execute(job.id)
+    assert runs == []
+    db.expire_all()
+    assert db.get(jobs.Job, job.id).attempts == 1
+
+def test_only_expired_running_jobs_are_requeued(client: TestClient, db, monkeypatch):
+    """
+    Test that start-up re-queues jobs whose lease expired, not ones another worker is running.
+    """
+    @jobs.handler("test_leased")
+    def leased(work_db, params, progress):
+        pass
+
+    dispatched = []
+    monkeypatch.setattr(jobs.runner, "_dispatch", lambda job_id, delay=0: dispatched.append(job_id))
+    stale = jobs.runner.submit(db, "test_leased", {})
+    live = jobs.runner.submit(db, "test_leased", {})
+    long_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=jobs.runner.lease + 60)
+    db.query(jobs.Job).filter(jobs.Job.id == stale.id).update({jobs.Job.status: jobs.RUNNING, jobs.Job.updated_at: long_ago})
+    db.query(jobs.Job).filter(jobs.Job.id == live.id).update({jobs.Job.status: jobs.RUNNING})
+    db.commit()
+    dispatched.clear()
+
+    jobs.runner.requeue_expired()
+    db.expire_all()
+    assert db.get(jobs.Job, stale.id).status == jobs.QUEUED
+    assert db.get(jobs.Job, live.id).status == jobs.RUNNING
+    assert dispatched == [stale.id]
+
+def test_read_missing_job(client: TestClient, auth_headers):
+    """
+    Test that reading an unknown job returns 404.
+    """
+    headers = auth_headers("jobs_missing@example.com")
+    assert client.get("/jobs/999999", headers=headers).status_code == 404
+
+def test_no_password_reset_jobs():
+    """
+    Test that there is no job kind changing passwords on behalf of other accounts.
+    """
+    assert "reset_passwords" not in jobs._handlers
+
+
+# --- The threaded runner, as in production ---
+
+@pytest.fixture
+def pooled_runner(tmp_path):
+    # Its own file-backed database: the pool's threads each need a connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    runner = jobs.JobRunner(sessionmaker(bind=engine), max_workers=2, retry_delay=0.1)
+    runner.start()
+    yield runner
+    runner.stop()
+    engine.dispose()
+
+def test_pool_limits_concurrency_and_retries_with_backoff(pooled_runner):
+    """
+    Test that jobs run in at most `max_workers` threads and that a failed
+    attempt is retried after the backoff delay.
+    """
+    lock = threading.Lock()
+    running, peak, attempts = [0], [0], []
+
+    @jobs.handler("test_pooled")
+    def pooled(work_db, params, progress):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        attempts.append((params["n"], time.monotonic(), threading.current_thread().name))
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        if params["n"] == 0 and len([a for a in attempts if a[0] == 0]) == 1:
+            raise RuntimeError("first attempt fails")
+
+    with pooled_runner.session_factory() as db:
+        job_ids = [pooled_runner.submit(db, "test_pooled", {"n": n}).id for n in range(5)]
+    assert [pooled_runner.wait(job_id, timeout=5) for job_id in job_ids] == ["succeeded"] * 5
+
+    assert peak[0] == 2
+    assert all(name.startswith("job") for _, _, name in attempts)
+    first, second = [at for n, at, _ in attempts if n == 0]
+    assert second - first >= 0.1
+
+def test_stopped_runner_leaves_jobs_queued_until_started(pooled_runner):
+    """
+    Test that jobs submitted while stopped stay queued and run after start.
+    """
+    @jobs.handler("test_restart")
+    def restart(work_db, params, progress):
+        return {"ran": True}
+
+    pooled_runner.stop()
+    with pooled_runner.session_factory() as db:
+        job_id = pooled_runner.submit(db, "test_restart", {}).id
+    time.sleep(0.1)
+    with pooled_runner.session_factory() as db:
+        assert db.get(jobs.Job, job_id).status == jobs.QUEUED
+
+    pooled_runner.start()
+    assert pooled_runner.wait(job_id, timeout=5) == "succeeded"
@@ -1,5 +1,10 @@
+from dataclasses import replace
+
 from fastapi.testclient import TestClient
 
+from core import audit, database, events, security
+from core.config import settings
+
 def test_read_root(client: TestClient):
     """
     Test that the root endpoint is accessible.
@@ -7,3 +12,54 @@ def test_read_root(client: TestClient):
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Welcome to the Education Platform API. Visit /docs for documentation."}
+
+def test_create_app_warms_up_and_reports_startup(session_factory, monkeypatch):
+    """
+    Test that the factory's lifespan warms everything up and reports what
+    start-up cost, per router import and per step.
+    """
+    from main import ROUTERS, create_app
+
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    # Start from the test settings, so the shared components keep them
+    app = create_app(replace(settings, warm_connections=0, stats_reconcile_interval=0))
+    assert app.state.startup_report is None
+
+    with TestClient(app) as client:
+        response = client.get("/health")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    steps = {step["name"] for step in data["startup"]["steps"]}
+    assert {f"import {name}" for name in ROUTERS} <= steps
+    assert {"reference snapshot", "connection pool", "password hashing", "response schemas"} <= steps
+    assert data["startup"]["total_seconds"] >= 0
+
+def test_create_app_applies_its_settings(connection, tmp_path, monkeypatch):
+    """
+    Test that the settings passed to the factory reach the shared components.
+    """
+    from main import create_app
+
+    # Restored after the test; everything else keeps the test settings
+    for obj, name in [(events.log, "capacity"), (events.log, "_events"), (audit.log, "sink")]:
+        monkeypatch.setattr(obj, name, getattr(obj, name))
+
+    path = tmp_path / "audit.ndjson"
+    app = create_app(replace(
+        settings,
+        event_log_capacity=3,
+        event_heartbeat_interval=1.5,
+        audit_sink_url=f"file://{path}",
+        audit_file_max_bytes=1024,
+        audit_file_backups=2,
+    ))
+    for i in range(4):
+        events.log.append("school.created", i, {})
+    assert events.log.capacity == 3
+    assert [e.school_id for e in events.log.recent()] == [1, 2, 3]
+    assert isinstance(audit.log.sink, audit.FileSink)
+    assert (audit.log.sink.path, audit.log.sink.max_bytes, audit.log.sink.backups) == (str(path), 1024, 2)
+    assert app.state.settings.event_heartbeat_interval == 1.5
+    # Fields that were not overridden are left as the tests configured them
+    assert security.get_password_hash("password123").startswith("$2b$04$")
@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+def test_create_and_read_role(client: TestClient, auth_headers):
+    """
+    Test that a created role is served by the role read endpoints.
+    """
+    headers = auth_headers("roles_admin@example.com")
+    response = client.post("/roles/", json={"name": "Teacher"}, headers=headers)
+    assert response.status_code == 201
+    role = response.json()
+    assert role["permissions"] == []
+
+    response = client.get(f"/roles/{role['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == role
+
+    response = client.get("/roles/", headers=headers)
+    assert role in response.json()
+
+def test_read_missing_role(client: TestClient, auth_headers):
+    """
+    Test that reading an unknown role returns 404.
+    """
+    headers = auth_headers("roles_missing@example.com")
+    response = client.get("/roles/999999", headers=headers)
+    assert response.status_code == 404
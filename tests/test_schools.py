@@ -0,0 +1,76 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from core import reference
+from core.models import School
+
+def test_create_and_read_school(client: TestClient):
+    """
+    Test that a created school is immediately visible through the read endpoints.
+    """
+    response = client.post("/schools/", json={"name": "Snapshot Academy"})
+    assert response.status_code == 201
+    school_id = response.json()["id"]
+
+    response = client.get(f"/schools/{school_id}")
+    assert response.status_code == 200
+    assert response.json() == {"id": school_id, "name": "Snapshot Academy", "branches": []}
+
+    names = [s["name"] for s in client.get("/schools/").json()]
+    assert "Snapshot Academy" in names
+
+def test_create_branch_updates_snapshot(client: TestClient):
+    """
+    Test that creating a branch swaps in a snapshot containing the new branch.
+    """
+    school_id = client.post("/schools/", json={"name": "Branching School"}).json()["id"]
+    # Make sure a snapshot is loaded so the write has to patch it
+    client.get("/schools/")
+    before = reference._snapshot
+
+    response = client.post(f"/schools/{school_id}/branches/", json={"name": "North"})
+    assert response.status_code == 201
+    branch = response.json()
+
+    # The old snapshot is left untouched (copy-on-write)
+    assert before.schools[school_id].branches == ()
+    data = client.get(f"/schools/{school_id}").json()
+    assert data["branches"] == [{"id": branch["id"], "name": "North", "school_id": school_id}]
+
+def test_read_missing_school(client: TestClient):
+    """
+    Test that reading an unknown school returns 404.
+    """
+    response = client.get("/schools/999999")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "School not found"}
+
+def test_schools_served_without_database(client: TestClient, monkeypatch):
+    """
+    Test that reads hit the snapshot rather than the database once it is loaded.
+    """
+    client.post("/schools/", json={"name": "No Round Trip"})
+    client.get("/schools/")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("snapshot should not be rebuilt")
+
+    monkeypatch.setattr(reference, "build_snapshot", fail)
+    response = client.get("/schools/")
+    assert response.status_code == 200
+    assert "No Round Trip" in [s["name"] for s in response.json()]
+
+def test_snapshot_is_rebuilt_once_expired(client: TestClient, db, monkeypatch):
+    """
+    Test that a school written by another worker (behind the snapshot's back)
+    shows up once the snapshot has outlived its maximum age.
+    """
+    monkeypatch.setattr(reference, "max_age", 0.05)
+    client.get("/schools/")
+    db.add(School(name="Other Worker School"))
+    db.commit()
+
+    assert "Other Worker School" not in [s["name"] for s in client.get("/schools/").json()]
+    time.sleep(0.06)
+    assert "Other Worker School" in [s["name"] for s in client.get("/schools/").json()]
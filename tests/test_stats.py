@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from core import stats
+from core.models import Base, Branch, School, SchoolStats
+
+def test_school_stats_are_maintained_incrementally(client: TestClient, db, make_user, auth_headers):
+    """
+    Test that branches, assignments and activation changes update the school counters.
+    """
+    admin = make_user("stats_admin@example.com")
+    teacher = make_user("stats_teacher@example.com")
+    headers = auth_headers("stats_admin@example.com")
+    school_id = client.post("/schools/", json={"name": "Stats School"}).json()["id"]
+    north = client.post(f"/schools/{school_id}/branches/", json={"name": "North"}).json()["id"]
+    south = client.post(f"/schools/{school_id}/branches/", json={"name": "South"}).json()["id"]
+    teacher_role = client.post("/roles/", json={"name": "Stats Teacher"}, headers=headers).json()["id"]
+    admin_role = client.post("/roles/", json={"name": "Stats Admin"}, headers=headers).json()["id"]
+
+    for user_id, role_id, branch_id in [
+        (teacher, teacher_role, north),
+        (teacher, teacher_role, south),  # same role in a second branch
+        (admin, admin_role, north),
+        (admin, teacher_role, north),  # second role in the same branch
+    ]:
+        client.post("/roles/assign", json={"user_id": user_id, "role_id": role_id, "branch_id": branch_id}, headers=headers)
+    client.put(f"/users/{teacher}/activation", json={"is_active": False}, headers=headers)
+
+    response = client.get(f"/schools/{school_id}/stats")
+    assert response.status_code == 200
+    expected = {
+        "school_id": school_id,
+        "branch_count": 2,
+        "active_users": 1,
+        "inactive_users": 1,
+        "users_per_role": [
+            {"role_id": teacher_role, "user_count": 2},
+            {"role_id": admin_role, "user_count": 1},
+        ],
+        "users_per_branch": [
+            {"branch_id": north, "user_count": 2},
+            {"branch_id": south, "user_count": 1},
+        ],
+    }
+    assert response.json() == expected
+
+    # A full reconciliation agrees with the incremental counters
+    stats.reconcile(db, school_id=school_id)
+    assert client.get(f"/schools/{school_id}/stats").json() == expected
+
+def test_school_stats_rebuilt_when_missing(client: TestClient, db):
+    """
+    Test that a school without a summary row gets one on first read.
+    """
+    school_id = client.post("/schools/", json={"name": "Legacy School"}).json()["id"]
+    client.post(f"/schools/{school_id}/branches/", json={"name": "Old Wing"})
+    db.query(SchoolStats).filter(SchoolStats.school_id == school_id).delete()
+    db.commit()
+
+    response = client.get(f"/schools/{school_id}/stats")
+    assert response.status_code == 200
+    assert response.json()["branch_count"] == 1
+
+def test_school_stats_missing_school(client: TestClient):
+    """
+    Test that stats for an unknown school return 404.
+    """
+    assert client.get("/schools/999999/stats").status_code == 404
+
+def test_reconcile_reads_inside_its_write_transaction(tmp_path):
+    """
+    Test that no other write can commit while reconcile reads the aggregates,
+    so it cannot overwrite a concurrent increment.
+    """
+    path = tmp_path / "stats.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        school = School(name="Locked School")
+        db.add(school)
+        db.flush()
+        db.add(Branch(name="Locked Branch", school_id=school.id))
+        db.commit()
+        school_id = school.id
+
+    blocked = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def concurrent_write(conn, cursor, statement, parameters, context, executemany):
+        # Another connection tries to write while reconcile reads the branches
+        if statement.startswith("SELECT branches.school_id AS branches_school_id, count(branches.id)"):
+            other = sqlite3.connect(path, timeout=0)
+            try:
+                with pytest.raises(sqlite3.OperationalError, match="locked"):
+                    other.execute("UPDATE branches SET name = name")
+                blocked.append(True)
+            finally:
+                other.close()
+
+    with Session(engine) as db:
+        stats.reconcile(db)
+        assert db.get(SchoolStats, school_id).branch_count == 1
+    engine.dispose()
+    assert blocked == [True]